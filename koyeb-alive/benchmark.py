@@ -0,0 +1,195 @@
+"""
+koyeb-alive 压测脚本
+
+在本地启动一个模拟 /v1/account/profile 的 HTTP 服务（可配置延迟、错误率和 429 行为），
+用 N 个合成账户驱动 koyeb-alive.py 的验证核心，输出吞吐量、单账户延迟分位数和峰值内存。
+用于在接入真实 PAT 之前调优 KOYEB_CONCURRENCY / KOYEB_RATE_LIMIT 等参数。
+
+示例:
+    python koyeb-alive/benchmark.py --accounts 500 --latency-ms 120 --concurrency 20 --rate-limit 50
+"""
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import resource
+import importlib.util
+import multiprocessing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "koyeb-alive.py")
+MOCK_EMAIL_DOMAIN = "bench.local"
+
+
+# --- 模拟 Koyeb API ---
+def run_mock_server(port_queue, latency_ms: float, jitter_ms: float, error_rate: float,
+                    rate_429: float, retry_after: int, seed: int):
+    """在独立进程中运行模拟服务，避免其内存和 CPU 计入被测客户端"""
+    rng = random.Random(seed)
+
+    class ProfileHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # 支持 keep-alive，与真实 API 行为一致
+
+        def do_GET(self):
+            delay = latency_ms + rng.uniform(-jitter_ms, jitter_ms)
+            time.sleep(max(delay, 0) / 1000)
+
+            roll = rng.random()
+            if roll < rate_429:
+                self.reply(429, {"error": "rate limited"}, {"Retry-After": str(retry_after)})
+                return
+            if roll < rate_429 + error_rate:
+                self.reply(500, {"error": "mock internal error"})
+                return
+
+            token = self.headers.get("Authorization", "").replace("Bearer ", "", 1)
+            self.reply(200, {"user": {
+                "email": f"{token}@{MOCK_EMAIL_DOMAIN}",
+                "flags": ["ACTIVE"],
+                "email_validated": True,
+            }})
+
+        def reply(self, status: int, body: dict, headers: dict = None):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ProfileHandler)
+    server.daemon_threads = True
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+# --- 被测模块加载 ---
+def load_koyeb_module(args):
+    """koyeb-alive.py 在导入时读取环境变量，因此需在加载前写入压测参数"""
+    os.environ["KOYEB_CONCURRENCY"] = str(args.concurrency)
+    os.environ["KOYEB_RATE_LIMIT"] = str(args.rate_limit)
+    os.environ["KOYEB_RATE_BURST"] = str(args.burst or args.concurrency)
+    os.environ["KOYEB_MAX_RETRIES"] = str(args.max_retries)
+    os.environ["KOYEB_RETRY_BACKOFF"] = str(args.retry_backoff)
+    os.environ.pop("KOYEB_STATE_FILE", None)
+
+    spec = importlib.util.spec_from_file_location("koyeb_alive", SCRIPT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_benchmark(args) -> dict:
+    port_queue = multiprocessing.Queue()
+    server = multiprocessing.Process(
+        target=run_mock_server,
+        args=(port_queue, args.latency_ms, args.jitter_ms, args.error_rate,
+              args.rate_429, args.retry_after, args.seed),
+        daemon=True,
+    )
+    server.start()
+    port = port_queue.get(timeout=10)
+
+    try:
+        koyeb = load_koyeb_module(args)
+        koyeb.KOYEB_PROFILE_URL = f"http://127.0.0.1:{port}/v1/account/profile"
+        logging.getLogger().setLevel(logging.WARNING if not args.verbose else logging.INFO)
+
+        # 包装验证函数以记录单账户耗时（不含限速器排队时间）
+        latencies = []
+        verify = koyeb.verify_koyeb_account_status
+
+        def timed_verify(email, pat):
+            start = time.perf_counter()
+            try:
+                return verify(email, pat)
+            finally:
+                latencies.append(time.perf_counter() - start)
+
+        koyeb.verify_koyeb_account_status = timed_verify
+
+        accounts = (
+            koyeb.KoyebAccount(f"acct{i}@{MOCK_EMAIL_DOMAIN}", f"acct{i}", i)
+            for i in range(1, args.accounts + 1)
+        )
+        limiter = koyeb.TokenBucket(koyeb.RATE_LIMIT, koyeb.RATE_BURST)
+
+        success_count = 0
+        total = 0
+        start = time.perf_counter()
+        for success, _, _ in koyeb.run_accounts(accounts, max(1, koyeb.MAX_WORKERS), limiter):
+            total += 1
+            success_count += success
+        elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.join()
+
+    latencies.sort()
+    return {
+        "accounts": total,
+        "success": success_count,
+        "failed": total - success_count,
+        "concurrency": args.concurrency,
+        "rate_limit": args.rate_limit,
+        "elapsed_s": round(elapsed, 3),
+        "accounts_per_s": round(total / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(koyeb.percentile(latencies, 50) * 1000, 1),
+            "p95": round(koyeb.percentile(latencies, 95) * 1000, 1),
+            "p99": round(koyeb.percentile(latencies, 99) * 1000, 1),
+            "max": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        },
+        # Linux 下 ru_maxrss 单位为 KB，macOS 下为字节
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                             / (1024 * 1024 if sys.platform == "darwin" else 1024), 1),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="koyeb-alive 本地压测")
+    parser.add_argument("--accounts", type=int, default=200, help="合成账户数量")
+    parser.add_argument("--concurrency", type=int, default=10, help="并发数 (KOYEB_CONCURRENCY)")
+    parser.add_argument("--rate-limit", type=float, default=1000, help="限速，请求/秒 (KOYEB_RATE_LIMIT)")
+    parser.add_argument("--burst", type=int, default=0, help="令牌桶容量，默认与并发数相同")
+    parser.add_argument("--max-retries", type=int, default=3, help="429/5xx 最大重试次数")
+    parser.add_argument("--retry-backoff", type=float, default=0.1, help="重试退避因子，单位：秒")
+    parser.add_argument("--latency-ms", type=float, default=100, help="模拟服务平均延迟，单位：毫秒")
+    parser.add_argument("--jitter-ms", type=float, default=20, help="延迟随机抖动幅度，单位：毫秒")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 500 的概率 (0-1)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="返回 429 的概率 (0-1)")
+    parser.add_argument("--retry-after", type=int, default=1, help="429 响应中的 Retry-After，单位：秒")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子，便于复现")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    parser.add_argument("--verbose", action="store_true", help="输出被测脚本的 INFO 日志")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run_benchmark(args)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    latency = report["latency_ms"]
+    print("📊 --- 压测结果 ---")
+    print(f"账户数: {report['accounts']} (✅ {report['success']} / ❌ {report['failed']})")
+    print(f"并发数: {report['concurrency']} | 限速: {report['rate_limit']} 请求/秒")
+    print(f"总耗时: {report['elapsed_s']} 秒 | 吞吐量: {report['accounts_per_s']} 账户/秒")
+    print(f"单账户延迟: p50 {latency['p50']} ms | p95 {latency['p95']} ms | "
+          f"p99 {latency['p99']} ms | max {latency['max']} ms")
+    print(f"峰值内存 (RSS): {report['peak_rss_mb']} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,38 @@
 import os
+import sys
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.connection import allowed_gai_family
 import json
+import hashlib
+import socket
 import time
 import logging
-from typing import List, Dict, Tuple, Any, Optional
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Tuple, Any, Optional, Iterator, Iterable
 from datetime import datetime, timezone, timedelta
 
 # --- 常量定义 ---
 KOYEB_PROFILE_URL = "https://app.koyeb.com/v1/account/profile"
 REQUEST_TIMEOUT = 30  # 请求超时，单位：秒
 BEIJING_TZ = timezone(timedelta(hours=8))
+MAX_WORKERS = int(os.getenv("KOYEB_CONCURRENCY", "5"))  # 并发验证的账户数，设为 1 即串行执行
+RATE_LIMIT = float(os.getenv("KOYEB_RATE_LIMIT", "2"))  # 令牌桶速率，单位：请求/秒
+RATE_BURST = int(os.getenv("KOYEB_RATE_BURST", str(MAX_WORKERS)))  # 令牌桶容量，允许的瞬时突发请求数
+POOL_SIZE = int(os.getenv("KOYEB_POOL_SIZE", str(max(MAX_WORKERS, 10))))  # 每个主机保持的长连接数
+MAX_RETRIES = int(os.getenv("KOYEB_MAX_RETRIES", "3"))  # 429/5xx 时的最大重试次数
+RETRY_BACKOFF = float(os.getenv("KOYEB_RETRY_BACKOFF", "1"))  # 重试退避因子，单位：秒
+STATE_FILE = os.getenv("KOYEB_STATE_FILE", "")  # 状态缓存文件路径，留空则不启用缓存
+STATE_TTL = float(os.getenv("KOYEB_STATE_TTL", "0"))  # 缓存有效期，单位：小时，期内的账户跳过验证
+REPORT_MODE = os.getenv("KOYEB_REPORT_MODE", "full")  # full: 完整报告；changes: 仅报告状态变化的账户
+LOGIN_FILE = os.getenv("KOYEB_LOGIN_FILE", "")  # 账户文件路径，"-" 表示从标准输入读取；设置后优先于 KOYEB_LOGIN
+METRICS_JSONL = os.getenv("KOYEB_METRICS_JSONL", "")  # 每账户耗时记录（JSON Lines，追加写入），留空则不输出
+METRICS_PROM = os.getenv("KOYEB_METRICS_PROM", "")  # node_exporter textfile collector 的 .prom 文件路径，留空则不输出
 
 # --- 日志配置 ---
 class BeijingTimeFormatter(logging.Formatter):
@@ -31,40 +54,335 @@ handler.setFormatter(BeijingTimeFormatter(
 
 logging.basicConfig(level=logging.INFO, handlers=[handler])
 
+# --- 请求耗时采集 ---
+class AccountMetrics:
+    """单个账户一次验证的耗时明细（秒）与结果分类"""
+    __slots__ = ('dns', 'connect', 'tls', 'ttfb', 'total', 'new_connections',
+                 'status_code', 'retries', 'outcome')
+
+    def __init__(self):
+        self.dns = 0.0
+        self.connect = 0.0
+        self.tls = 0.0
+        self.ttfb = 0.0
+        self.total = 0.0
+        self.new_connections = 0
+        self.status_code: Optional[int] = None
+        self.retries = 0
+        self.outcome = "unknown"
+
+_metrics_local = threading.local()
+
+def current_metrics() -> Optional[AccountMetrics]:
+    """返回当前线程正在采集的账户耗时记录"""
+    return getattr(_metrics_local, 'current', None)
+
+def set_outcome(outcome: str) -> None:
+    metrics = current_metrics()
+    if metrics:
+        metrics.outcome = outcome
+
+class TimedConnectionMixin:
+    """
+    拆分新建连接的 DNS / TCP / TLS 耗时与每次请求的 TTFB，累加到当前线程的 AccountMetrics。
+    复用 keep-alive 连接的请求不会经过 _new_conn，三项建连耗时均为 0。
+    """
+    def _new_conn(self):
+        metrics = current_metrics()
+        start = time.perf_counter()
+        if metrics:
+            # 仅用于计时的独立解析，实际建连仍交给 urllib3（保留多地址回退与 allowed_gai_family）
+            try:
+                socket.getaddrinfo(self._dns_host, self.port, allowed_gai_family(), socket.SOCK_STREAM)
+            except OSError:
+                pass  # 解析失败时交由 urllib3 抛出标准异常
+        resolved = time.perf_counter()
+
+        sock = super()._new_conn()
+
+        self._setup_time = time.perf_counter() - start
+        if metrics:
+            metrics.dns += resolved - start
+            metrics.connect += time.perf_counter() - resolved  # 含 urllib3 自身的解析，通常命中系统缓存
+            metrics.new_connections += 1
+        return sock
+
+    def connect(self):
+        self._setup_time = 0.0
+        start = time.perf_counter()
+        super().connect()
+        metrics = current_metrics()
+        if metrics:
+            metrics.tls += max(time.perf_counter() - start - self._setup_time, 0.0)
+
+    def getresponse(self, *args, **kwargs):
+        start = time.perf_counter()
+        response = super().getresponse(*args, **kwargs)
+        metrics = current_metrics()
+        if metrics:
+            # 请求发出后到收到响应头的等待时间；重试时以最后一次为准，不含退避与 Retry-After 的等待
+            metrics.ttfb = time.perf_counter() - start
+        return response
+
+class TimedHTTPConnection(TimedConnectionMixin, HTTPConnection):
+    pass
+
+class TimedHTTPSConnection(TimedConnectionMixin, HTTPSConnection):
+    pass
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """使用带耗时采集的连接类，其余行为与 HTTPAdapter 相同"""
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """对已排序的数据做线性插值求分位数"""
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+# --- 共享连接池 ---
+def build_http_session() -> requests.Session:
+    """
+    创建带连接池和重试策略的 Session，所有请求复用 keep-alive 连接。
+    遇到 429/5xx 时按指数退避重试，并优先遵循服务端返回的 Retry-After。
+    只重试幂等的 GET：POST（Telegram sendMessage）在服务端已受理后才返回 5xx 时重试会重复推送。
+    """
+    retry = Retry(
+        total=MAX_RETRIES,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,  # 重试耗尽后返回最后一次响应，由调用方按状态码处理
+    )
+    adapter = TimedHTTPAdapter(pool_connections=2, pool_maxsize=POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+http_session = build_http_session()
+
+# --- 状态缓存 ---
+class StatusStore:
+    """
+    以邮箱哈希为键的 JSON 状态文件，记录每个账户上次的验证结果和时间。
+    文件中不保存明文邮箱或 PAT。
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.data: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.data = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logging.warning(f"⚠️ 状态缓存文件读取失败，将重新建立: {e}")
+
+    @staticmethod
+    def key(email: str) -> str:
+        return hashlib.sha256(email.strip().lower().encode('utf-8')).hexdigest()
+
+    def get(self, email: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            return self.data.get(self.key(email))
+
+    def is_fresh(self, record: Optional[Dict[str, Any]], ttl_hours: float) -> bool:
+        if not record or ttl_hours <= 0:
+            return False
+        return time.time() - record.get('checked_at', 0) < ttl_hours * 3600
+
+    def update(self, email: str, success: bool, message: str) -> None:
+        with self.lock:
+            self.data[self.key(email)] = {
+                'success': success,
+                'message': message,
+                'checked_at': time.time(),
+            }
+
+    def save(self) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with self.lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+
+# --- 指标输出 ---
+class MetricsRecorder:
+    """
+    收集每个账户的 AccountMetrics：逐条追加到 JSON Lines 文件，
+    运行结束后汇总写入 Prometheus textfile collector 格式的 .prom 文件。
+    """
+    PHASES = ('dns', 'connect', 'tls', 'ttfb', 'total')
+    QUANTILES = (50, 95, 99)
+
+    def __init__(self, jsonl_path: str = "", prom_path: str = ""):
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.outcomes: Dict[str, int] = {}
+        self.samples: Dict[str, List[float]] = {phase: [] for phase in self.PHASES}
+        self.jsonl_file = open(jsonl_path, 'a', encoding='utf-8') if jsonl_path else None
+
+    def record(self, email: str, line_no: int, success: bool, metrics: AccountMetrics) -> None:
+        with self.lock:
+            self.outcomes[metrics.outcome] = self.outcomes.get(metrics.outcome, 0) + 1
+            if metrics.outcome not in ("cached", "incomplete"):  # 未发出请求的账户不计入耗时分布
+                for phase in self.PHASES:
+                    self.samples[phase].append(getattr(metrics, phase))
+            if self.jsonl_file:
+                entry = {
+                    "ts": datetime.now(BEIJING_TZ).isoformat(timespec='seconds'),
+                    "account": StatusStore.key(email) if email else None,
+                    "line_no": line_no,
+                    "outcome": metrics.outcome,
+                    "success": success,
+                    "status_code": metrics.status_code,
+                    "retries": metrics.retries,
+                    "new_connections": metrics.new_connections,
+                }
+                for phase in self.PHASES:
+                    entry[f"{phase}_ms"] = round(getattr(metrics, phase) * 1000, 2)
+                self.jsonl_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def close(self) -> None:
+        if self.jsonl_file:
+            self.jsonl_file.close()
+            self.jsonl_file = None
+            logging.info(f"📈 耗时明细已写入: {self.jsonl_path}")
+        if self.prom_path:
+            self.write_prom()
+            logging.info(f"📈 Prometheus 指标已写入: {self.prom_path}")
+
+    def write_prom(self) -> None:
+        lines = [
+            "# HELP koyeb_alive_accounts Accounts processed in the last run, by outcome.",
+            "# TYPE koyeb_alive_accounts gauge",
+        ]
+        for outcome, count in sorted(self.outcomes.items()):
+            lines.append(f'koyeb_alive_accounts{{outcome="{outcome}"}} {count}')
+        lines += [
+            "# HELP koyeb_alive_request_seconds Per-account Koyeb API request phase durations in the last run.",
+            "# TYPE koyeb_alive_request_seconds summary",
+        ]
+        for phase in self.PHASES:
+            values = sorted(self.samples[phase])
+            for q in self.QUANTILES:
+                lines.append(f'koyeb_alive_request_seconds{{phase="{phase}",quantile="{q / 100}"}} '
+                             f'{percentile(values, q):.6f}')
+            lines.append(f'koyeb_alive_request_seconds_sum{{phase="{phase}"}} {sum(values):.6f}')
+            lines.append(f'koyeb_alive_request_seconds_count{{phase="{phase}"}} {len(values)}')
+        lines += [
+            "# HELP koyeb_alive_run_duration_seconds Wall time of the last run.",
+            "# TYPE koyeb_alive_run_duration_seconds gauge",
+            f"koyeb_alive_run_duration_seconds {time.time() - self.started:.3f}",
+            "# HELP koyeb_alive_last_run_timestamp_seconds Unix time the last run finished.",
+            "# TYPE koyeb_alive_last_run_timestamp_seconds gauge",
+            f"koyeb_alive_last_run_timestamp_seconds {time.time():.0f}",
+        ]
+        # 先写临时文件再原子替换，避免 node_exporter 读到写了一半的文件
+        tmp_path = f"{self.prom_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.prom_path)
+
+# --- 令牌桶限速器 ---
+class TokenBucket:
+    """
+    线程安全的令牌桶，替代固定的 time.sleep 间隔。
+    每秒补充 rate 个令牌，最多累积 capacity 个，acquire() 在无令牌时阻塞等待。
+    """
+    def __init__(self, rate: float, capacity: int):
+        self.rate = max(rate, 0.001)
+        self.capacity = max(capacity, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
 # --- 账户加载/验证函数 ---
-def validate_and_load_accounts() -> List[Dict[str, str]]:
+class KoyebAccount:
+    """单个账户记录，使用 __slots__ 以便在数万账户时保持内存占用稳定"""
+    __slots__ = ('email', 'pat', 'line_no')
+
+    def __init__(self, email: str, pat: str, line_no: int):
+        self.email = email
+        self.pat = pat
+        self.line_no = line_no
+
+def iter_text_lines(text: str) -> Iterator[str]:
+    """逐行遍历字符串，不一次性生成整个行列表"""
+    start = 0
+    length = len(text)
+    while start < length:
+        end = text.find('\n', start)
+        if end == -1:
+            end = length
+        yield text[start:end]
+        start = end + 1
+
+def iter_source_lines() -> Iterator[str]:
     """
-    从环境变量 KOYEB_LOGIN 加载账户信息。
-    格式: "email1:PAT1\nemail2:PAT2"
+    按配置选择账户来源：KOYEB_LOGIN_FILE 指定的文件（"-" 为标准输入），否则为 KOYEB_LOGIN 环境变量。
     """
+    if LOGIN_FILE:
+        if LOGIN_FILE == "-":
+            logging.info("📥 从标准输入读取账户信息")
+            yield from sys.stdin
+            return
+        logging.info(f"📥 从文件读取账户信息: {LOGIN_FILE}")
+        with open(LOGIN_FILE, 'r', encoding='utf-8') as f:
+            yield from f
+        return
+
     koyeb_login_env = os.getenv("KOYEB_LOGIN")
     if not koyeb_login_env:
         logging.error(f"❌ KOYEB_LOGIN 变量未配置，脚本无法继续执行")
-        raise ValueError("必须配置 KOYEB_LOGIN 环境变量")
+        raise ValueError("必须配置 KOYEB_LOGIN 环境变量或 KOYEB_LOGIN_FILE")
+    yield from iter_text_lines(koyeb_login_env)
 
-    accounts = []
-    lines = koyeb_login_env.strip().split('\n') # 按行分割，并处理空行
-    
-    for line in lines:
+def iter_accounts() -> Iterator[KoyebAccount]:
+    """
+    惰性解析账户，边读取边产出，格式: "email1:PAT1\nemail2:PAT2"
+    格式错误的行会带行号记录警告后跳过。
+    """
+    for line_no, line in enumerate(iter_source_lines(), 1):
         line = line.strip()
-        if not line or ':' not in line:
-            logging.warning(f"⚠️ 跳过无效或空行: {line}")
+        if not line:
             continue
-
-        try:
-            email, pat = line.split(':', 1) # 只按第一个冒号分割，防止PAT中包含冒号被误分
-            accounts.append({
-                'email': email.strip(),
-                'pat': pat.strip()
-            })
-        except ValueError:
-            logging.error(f"⚠️ KOYEB_LOGIN 行格式错误，应为 email:PAT -> {line}")
+        if ':' not in line:
+            logging.warning(f"⚠️ 第 {line_no} 行格式错误，应为 email:PAT，已跳过")
             continue
-            
-    if not accounts:
-        raise ValueError("KOYEB_LOGIN 环境变量未包含任何有效账户信息")
-    
-    return accounts
+
+        email, pat = line.split(':', 1) # 只按第一个冒号分割，防止PAT中包含冒号被误分
+        yield KoyebAccount(email.strip(), pat.strip(), line_no)
 
 # --- Telegram 发送函数 ---
 def send_tg_message(message: str) -> Optional[Dict[str, Any]]:
@@ -82,7 +400,7 @@ def send_tg_message(message: str) -> Optional[Dict[str, Any]]:
         "parse_mode": "Markdown"
     }
     try:
-        response = requests.post(url, data=payload, timeout=REQUEST_TIMEOUT)
+        response = http_session.post(url, data=payload, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.HTTPError as http_err:
@@ -108,14 +426,20 @@ def verify_koyeb_account_status(email: str, pat: str) -> Tuple[bool, str]:
     }
 
     try:
-        response = requests.get(
+        response = http_session.get(
             KOYEB_PROFILE_URL,  
             headers=headers,  
             timeout=REQUEST_TIMEOUT,
         )
         
+        metrics = current_metrics()
+        if metrics:
+            metrics.status_code = response.status_code
+            metrics.retries = len(getattr(getattr(response.raw, 'retries', None), 'history', ()) or ())
+
         # 检查 HTTP 状态码
         if response.status_code == 401 or response.status_code == 403:
+             set_outcome("auth_failed")
              return False, "验证失败：PAT 无效或已过期。"
         
         response.raise_for_status() # 抛出非 2xx 状态码错误
@@ -129,21 +453,28 @@ def verify_koyeb_account_status(email: str, pat: str) -> Tuple[bool, str]:
         
         # 严格验证逻辑
         if returned_email.lower() != email.lower():
+            set_outcome("email_mismatch")
             return False, f"验证失败：API返回邮箱({returned_email})与提供邮箱不匹配。"
         
         is_active = "ACTIVE" in flags
         
         if is_active and email_validated:
+            set_outcome("active")
             return True, "活跃且邮箱已验证"
         elif not is_active:
+            set_outcome("inactive")
             return False, f"原因: 非活跃 (Flags: {', '.join(flags)})"
         elif not email_validated:
+            set_outcome("email_unverified")
             return False, "原因: 邮箱未验证"
         else:
+            set_outcome("unknown_account")
             return False, f"原因: 未知账户: {user_info}"
 
 
     except requests.exceptions.HTTPError as http_err:
+        status_code = http_err.response.status_code
+        set_outcome("rate_limited" if status_code == 429 else "server_error" if status_code >= 500 else "http_error")
         try:
             error_data = http_err.response.json()
             error_message = error_data.get('error', http_err.response.text)
@@ -151,50 +482,148 @@ def verify_koyeb_account_status(email: str, pat: str) -> Tuple[bool, str]:
         except json.JSONDecodeError:
             return False, f"原因: HTTP错误 (状态码 {http_err.response.status_code}): {http_err.response.text}"
     except requests.exceptions.Timeout:
+        set_outcome("timeout")
         return False, "原因: 请求超时"
     except requests.exceptions.RequestException as e:
+        set_outcome("network_error")
         return False, f"原因: 网络请求异常: {e}"
     except Exception as e:
+        set_outcome("exception")
         return False, f"原因: 处理响应时发生异常: {e}"
         
+# --- 单账户处理函数 ---
+def process_account(index: int, account: KoyebAccount, limiter: TokenBucket,
+                    store: Optional[StatusStore] = None,
+                    recorder: Optional[MetricsRecorder] = None) -> Tuple[bool, str, Optional[bool]]:
+    """
+    处理单个账户，返回 (是否成功, 报告片段, 状态是否变化)；账户行信息不完整时状态变化为 None。
+    在线程池中执行，报告片段由调用方按账户原始顺序拼接。
+    本线程内产生的请求耗时记入 AccountMetrics，并交给 recorder 输出。
+    """
+    metrics = AccountMetrics()
+    _metrics_local.current = metrics
+    try:
+        success, block, changed = _process_account(index, account, limiter, store)
+    finally:
+        _metrics_local.current = None
+
+    if recorder:
+        recorder.record(account.email, account.line_no, success, metrics)
+    return success, block, changed
+
+def _process_account(index: int, account: KoyebAccount, limiter: TokenBucket,
+                     store: Optional[StatusStore] = None) -> Tuple[bool, str, Optional[bool]]:
+    """
+    启用状态缓存时，TTL 内验证过的账户直接沿用上次结果，不再请求 API。
+    """
+    email = account.email
+    pat = account.pat
+
+    if not email or not pat:
+        logging.warning(f"⚠️ 第 {index} 个账户（第 {account.line_no} 行）信息不完整，已跳过")
+        set_outcome("incomplete")
+        # 不是账户状态的变化，仅报告模式下单独列出，不计入状态变化
+        return False, f"第 {account.line_no} 行: {'缺少个人访问令牌' if email else '未提供邮箱'}\n", None
+
+    previous = store.get(email) if store else None
+    if store and store.is_fresh(previous, STATE_TTL):
+        logging.info(f"💾 第 {index} 个账户 {email} 在缓存有效期内，沿用上次结果")
+        set_outcome("cached")
+        success, message = previous['success'], previous['message']
+        checked_at = datetime.fromtimestamp(previous['checked_at'], BEIJING_TZ).strftime("%Y-%m-%d %H:%M")
+        status_line = f"状态: ✅ {message}" if success else f"状态: ❌ 验证失败\n  {message}"
+        return success, f"账户: `{email}`\n{status_line} (缓存于 {checked_at})\n", False
+
+    limiter.acquire()
+    logging.info(f"🚀 正在处理第 {index} 个账户: {email}")
+
+    started = time.perf_counter()
+    try:
+        # 调用验证函数
+        success, message = verify_koyeb_account_status(email, pat)
+        if success:
+            status_line = f"状态: ✅ {message}"
+        else:
+            status_line = f"状态: ❌ 验证失败\n  {message}"
+    except Exception as e:
+        logging.error(f"❌ 处理账户 {email} 时发生未知异常: {e}")
+        set_outcome("exception")
+        success = False
+        message = f"执行时发生未知异常 - {e}"
+        status_line = f"状态: ❌ 验证失败\n  {message}"
+    current_metrics().total = time.perf_counter() - started
+
+    changed = True
+    if store:
+        changed = previous is None or previous.get('success') != success or previous.get('message') != message
+        if previous is not None and changed:
+            old_state = "✅" if previous.get('success') else "❌"
+            status_line += f"\n  状态变化: {old_state} {previous.get('message')} → {'✅' if success else '❌'}"
+        store.update(email, success, message)
+
+    return success, f"账户: `{email}`\n{status_line}\n", changed
+
+def run_accounts(accounts: Iterable[KoyebAccount], workers: int, limiter: TokenBucket,
+                 store: Optional[StatusStore] = None,
+                 recorder: Optional[MetricsRecorder] = None) -> Iterator[Tuple[bool, str, Optional[bool]]]:
+    """
+    边解析边提交到线程池，并按账户原始顺序产出结果。
+    在途任务数限制为 workers 的两倍，账户来源再大内存占用也保持稳定。
+    """
+    window = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for index, account in enumerate(accounts, 1):
+            window.append(executor.submit(process_account, index, account, limiter, store, recorder))
+            if len(window) >= workers * 2:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+
 def main():
     try:
-        koyeb_accounts = validate_and_load_accounts()
-        
         results = []
         current_time_dt = datetime.now(BEIJING_TZ)
         current_time = current_time_dt.strftime("%Y-%m-%d %H:%M:%S")
-        total_accounts = len(koyeb_accounts)
+        incomplete = []
+        total_accounts = 0
         success_count = 0
 
-        for index, account in enumerate(koyeb_accounts, 1):
-            email = account.get('email', '').strip()
-            pat = account.get('pat', '')
+        limiter = TokenBucket(RATE_LIMIT, RATE_BURST)
+        store = StatusStore(STATE_FILE) if STATE_FILE else None
+        changes_only = REPORT_MODE == "changes" and store is not None
+        recorder = MetricsRecorder(METRICS_JSONL, METRICS_PROM) if (METRICS_JSONL or METRICS_PROM) else None
+        workers = max(1, MAX_WORKERS)
+        logging.info(f"⚙️ 并发数: {workers}，限速: {RATE_LIMIT} 请求/秒")
 
-            if not email or not pat:
-                logging.warning(f"⚠️ 第 {index}/{total_accounts} 个账户信息不完整，已跳过")
-                results.append(f"账户: 未提供邮箱\n状态: ❌ 信息不完整\n")
-                continue
-
-            logging.info(f"🚀 正在处理第 {index}/{total_accounts} 个账户: {email}")
-            time.sleep(10)
-
-            try:
-                # 调用验证函数
-                success, message = verify_koyeb_account_status(email, pat)
+        try:
+            for success, block, changed in run_accounts(iter_accounts(), workers, limiter, store, recorder):
+                total_accounts += 1
                 if success:
-                    status_line = f"状态: ✅ {message}"
                     success_count += 1
-                else:
-                    status_line = f"状态: ❌ 验证失败\n  {message}"
-            except Exception as e:
-                logging.error(f"❌ 处理账户 {email} 时发生未知异常: {e}")
-                status_line = f"状态: ❌ 验证失败\n  执行时发生未知异常 - {e}"
+                if changed is None:
+                    incomplete.append(block)
+                elif changed or not changes_only:
+                    results.append(block)
+        finally:
+            if recorder:
+                recorder.close()
+
+        if total_accounts == 0:
+            raise ValueError("KOYEB_LOGIN 环境变量未包含任何有效账户信息")
 
-            results.append(f"账户: `{email}`\n{status_line}\n")
+        if store:
+            store.save()
+            logging.info(f"💾 状态缓存已写入: {STATE_FILE}")
 
         summary = f"📊 总计: {total_accounts} 个账户\n✅ 成功: {success_count} 个 | ❌ 失败: {total_accounts - success_count} 个"
         report_body = "".join(results)
+        if changes_only:
+            summary += f"\n🔄 状态变化: {len(results)} 个"
+            if not results:
+                report_body = "所有账户状态与上次相同\n"
+        if incomplete:
+            summary += f"\n⚠️ 信息不完整: {len(incomplete)} 行"
+            report_body += "---------------------------\n⚠️ 信息不完整的账户行（已跳过）:\n" + "".join(incomplete)
         tg_message = (
             f"🤖 *Koyeb 账户状态报告* 🤖\n"
             f"=====================\n"
@@ -210,14 +639,12 @@ def main():
 
         if success_count == 0 and total_accounts > 0:
             logging.error("❌ 所有账户验证失败，脚本将以非零状态码退出")
-            import sys
             sys.exit(1)
 
     except Exception as e:
         error_message = f"❌ 程序初始化失败: {e}"
         logging.error(error_message)
         send_tg_message(error_message)
-        import sys
         sys.exit(1)
             
 if __name__ == "__main__":
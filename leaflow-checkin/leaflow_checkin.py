@@ -5,32 +5,694 @@ Leaflow 自动签到脚本
 """
 
 import os
+import re
+import json
 import time
+import base64
+import hashlib
 import logging
+import functools
+import multiprocessing
+from multiprocessing.util import Finalize
+from concurrent.futures import ProcessPoolExecutor
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.action_chains import ActionChains
-from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, StaleElementReferenceException
 import requests
+from requests.adapters import HTTPAdapter
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:  # 未安装 cryptography 时禁用会话持久化
+    Fernet = None
+from urllib.parse import urljoin, urlsplit
+from html import unescape, escape
+from contextlib import contextmanager
 from datetime import datetime
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+def create_driver():
+    """创建Chrome驱动"""
+    chrome_options = Options()
+    
+    # GitHub Actions环境配置
+    if os.getenv('GITHUB_ACTIONS'):
+        chrome_options.add_argument('--headless')
+        chrome_options.add_argument('--no-sandbox')
+        chrome_options.add_argument('--disable-dev-shm-usage')
+        chrome_options.add_argument('--disable-gpu')
+        chrome_options.add_argument('--window-size=1920,1080')
+    
+    # 通用配置
+    chrome_options.add_argument('--disable-blink-features=AutomationControlled')
+    chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    chrome_options.add_experimental_option('useAutomationExtension', False)
+    
+    driver = webdriver.Chrome(options=chrome_options)
+    driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+    return driver
+
+# 一次脚本调用同时检查全部候选选择器（"//" 开头为 XPath，其余为 CSS），
+# 按候选顺序返回第一个满足条件（可见、可点击、文本匹配）的 [序号, 元素]，都不满足返回 null
+_QUERY_HELPERS_JS = """
+const queryAll = (selector) => {
+    try {
+        if (selector.startsWith('//')) {
+            const snapshot = document.evaluate(selector, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+            const nodes = [];
+            for (let j = 0; j < snapshot.snapshotLength; j++) nodes.push(snapshot.snapshotItem(j));
+            return nodes;
+        }
+        return Array.from(document.querySelectorAll(selector));
+    } catch (e) {
+        return [];
+    }
+};
+const isVisible = (el) => !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+"""
+
+SELECTOR_QUERY_JS = _QUERY_HELPERS_JS + """
+const [candidates, clickable, textPattern] = arguments;
+const textRe = textPattern ? new RegExp(textPattern) : null;
+for (let i = 0; i < candidates.length; i++) {
+    for (const el of queryAll(candidates[i])) {
+        if (!isVisible(el)) continue;
+        if (clickable && el.disabled) continue;
+        if (textRe && !textRe.test(el.innerText || el.value || '')) continue;
+        return [i, el];
+    }
+}
+return null;
+"""
+
+# 一次脚本调用取回页面快照：页面全文，以及每组候选选择器命中的可见元素文本 [[候选序号, 文本], ...]，
+# 余额、签到结果都在本地用预编译的正则解析，不再逐个元素经 WebDriver 读取 .text
+DOM_SNAPSHOT_JS = _QUERY_HELPERS_JS + """
+const [groups, maxItems, maxText] = arguments;
+const result = {url: location.href, body: (document.body ? document.body.innerText : '').slice(0, 200000), groups: {}};
+for (const [name, candidates] of Object.entries(groups)) {
+    const hits = [];
+    candidates.forEach((selector, i) => {
+        for (const el of queryAll(selector)) {
+            if (hits.length >= maxItems) break;
+            if (!isVisible(el)) continue;
+            const text = (el.innerText || '').trim();
+            if (text) hits.push([i, text.slice(0, maxText)]);
+        }
+    });
+    result.groups[name] = hits;
+}
+return result;
+"""
+
+# -------------------------------
+# 分阶段耗时统计
+class PhaseProfiler:
+    """
+    记录单个账号各阶段的墙钟耗时与 WebDriver 命令数（每条命令即一次到 chromedriver 的 HTTP 往返）。
+    命令由 instrument_driver 包装后的 driver.execute 计入当前所在的阶段，嵌套阶段只计入最内层。
+    """
+    def __init__(self):
+        self.phases = {}
+        self.stack = []
+        self.total_commands = 0
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        record = self.phases.setdefault(name, {"seconds": 0.0, "commands": 0, "calls": 0})
+        record["calls"] += 1
+        self.stack.append(record)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record["seconds"] += time.perf_counter() - start
+            self.stack.pop()
+
+    def count_command(self, command):
+        self.total_commands += 1
+        if self.stack:
+            self.stack[-1]["commands"] += 1
+
+    def to_dict(self):
+        return {
+            "total_seconds": round(time.perf_counter() - self.started, 3),
+            "total_commands": self.total_commands,
+            "phases": {
+                name: {"seconds": round(r["seconds"], 3), "commands": r["commands"], "calls": r["calls"]}
+                for name, r in self.phases.items()
+            },
+        }
+
+def profiled(phase):
+    """把方法的执行计入 self.profiler 的 phase 阶段"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            with self.profiler.phase(phase):
+                return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+def instrument_driver(driver):
+    """包装 driver.execute：每条 WebDriver 命令（含元素命令）都回调 driver.command_listener（若已设置）"""
+    if hasattr(driver, "command_listener"):
+        return
+    execute = driver.execute
+    driver.command_listener = None
+
+    def counted_execute(driver_command, params=None):
+        listener = driver.command_listener
+        if listener:
+            listener(driver_command)
+        return execute(driver_command, params)
+
+    driver.execute = counted_execute
+
+# 阶段在通知表格中的简称
+PHASE_LABELS = {
+    "setup_driver": "setup",
+    "restore_session": "restore",
+    "login": "login",
+    "api_checkin": "api",
+    "wait_for_checkin_page_loaded": "page_wait",
+    "find_and_click_checkin_button": "click",
+    "get_checkin_result": "result",
+    "get_balance": "balance",
+}
+
+def build_profile_report(emails, profiles, run_seconds):
+    """汇总各账号的阶段统计：每个账号的明细（账号以邮箱哈希标识）与全部账号的合计"""
+    totals = {}
+    accounts = []
+    for index, (email, profile) in enumerate(zip(emails, profiles), 1):
+        accounts.append({
+            "index": index,
+            "account": hashlib.sha256(email.strip().lower().encode("utf-8")).hexdigest(),
+            **profile,
+        })
+        for name, record in profile.get("phases", {}).items():
+            total = totals.setdefault(name, {"seconds": 0.0, "commands": 0, "calls": 0})
+            for field in total:
+                total[field] += record[field]
+    for total in totals.values():
+        total["seconds"] = round(total["seconds"], 3)
+    return {
+        "run_seconds": round(run_seconds, 3),
+        "accounts": accounts,
+        "totals": {
+            "seconds": round(sum(a.get("total_seconds", 0) for a in accounts), 3),
+            "commands": sum(a.get("total_commands", 0) for a in accounts),
+            "phases": totals,
+        },
+    }
+
+def format_profile_table(report, max_accounts=5):
+    """生成紧凑的等宽表格：各阶段合计（按耗时降序），以及耗时最长的几个账号"""
+    lines = [f"{'phase':<10}{'sec':>8}{'cmds':>7}"]
+    for name, total in sorted(report["totals"]["phases"].items(), key=lambda item: -item[1]["seconds"]):
+        lines.append(f"{PHASE_LABELS.get(name, name)[:10]:<10}{total['seconds']:>8.1f}{total['commands']:>7}")
+    lines.append(f"{'total':<10}{report['totals']['seconds']:>8.1f}{report['totals']['commands']:>7}")
+    slowest = sorted(report["accounts"], key=lambda a: -a.get("total_seconds", 0))[:max_accounts]
+    if slowest:
+        lines.append("")
+        lines.append(f"{'account':<10}{'sec':>8}{'cmds':>7}")
+        for account in slowest:
+            lines.append(f"{'#' + str(account['index']):<10}{account.get('total_seconds', 0):>8.1f}{account.get('total_commands', 0):>7}")
+    lines.append(f"{'run':<10}{report['run_seconds']:>8.1f}")
+    return "\n".join(lines)
+
+class SelectorCache:
+    """
+    记录每个页面元素上次命中的选择器（键如 login.email），持久化为 JSON 文件。
+    下次查找时该选择器排在最前面；保存时与文件中已有内容合并，多进程写入互不覆盖。
+    只缓存具体的选择器：按文本或 class 片段模糊匹配的兜底选择器命中时不记住，
+    并清除该键已缓存的选择器（它这次没有命中），避免兜底选择器长期排在优先选择器之前。
+    """
+    GENERIC_MARKERS = ("contains(text()", "contains(@class", "*=", "//*")
+    def __init__(self, path):
+        self.path = path
+        self.data = self._read()
+        self.removed = set()  # 本次运行中失效的键，保存时也要从文件里删除
+        self.dirty = False
+
+    def _read(self):
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ 选择器缓存读取失败，将重新建立: {e}")
+            return {}
+
+    def order(self, key, candidates):
+        """把上次命中的选择器排到最前"""
+        cached = self.data.get(key)
+        if cached in candidates:
+            return [cached] + [c for c in candidates if c != cached]
+        return list(candidates)
+
+    @classmethod
+    def is_specific(cls, selector):
+        return not any(marker in selector for marker in cls.GENERIC_MARKERS)
+
+    def remember(self, key, selector):
+        if not self.is_specific(selector):
+            if self.data.pop(key, None) is not None:
+                self.removed.add(key)
+                self.dirty = True
+            return
+        if self.data.get(key) != selector:
+            self.data[key] = selector
+            self.removed.discard(key)
+            self.dirty = True
+
+    def save(self):
+        if not self.path or not self.dirty:
+            return
+        try:
+            merged = self._read()
+            for key in self.removed:
+                merged.pop(key, None)
+            merged.update(self.data)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(merged, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+        except OSError as e:
+            logger.warning(f"⚠️ 选择器缓存保存失败: {e}")
+
+# 选择器缓存文件，设为空字符串时不持久化
+selector_cache = SelectorCache(os.getenv(
+    'LEAFLOW_SELECTOR_CACHE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.selector_cache.json')
+))
+
+# 需要保存/清理登录状态的站点
+LEAFLOW_ORIGINS = ["https://leaflow.net", "https://checkin.leaflow.net"]
+# CDP Network.setCookies 接受的 Cookie 字段
+COOKIE_PARAM_KEYS = ("name", "value", "domain", "path", "secure", "httpOnly", "sameSite", "expires")
+
+def clear_browser_state(driver):
+    """清空浏览器中所有 Cookie 以及 Leaflow 各站点的本地存储"""
+    driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+    for origin in LEAFLOW_ORIGINS:
+        driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+
+class SessionStore:
+    """
+    按账号保存登录快照（Cookie + localStorage），使用 Fernet 加密落盘。
+    文件名为邮箱的 SHA-256，目录中不出现明文邮箱或 Cookie。
+    """
+    def __init__(self, directory, passphrase):
+        self.directory = directory
+        key = base64.urlsafe_b64encode(hashlib.sha256(passphrase.encode("utf-8")).digest())
+        self.fernet = Fernet(key)
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, email):
+        digest = hashlib.sha256(email.strip().lower().encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest}.bin")
+
+    def load(self, email):
+        """返回 {"cookies": [...], "local_storage": {origin: {key: value}}}，没有或无法解密时返回 None"""
+        path = self._path(email)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                snapshot = json.loads(self.fernet.decrypt(f.read()))
+        except (OSError, ValueError, InvalidToken) as e:
+            logger.warning(f"⚠️ 读取已保存的登录状态失败，将重新登录: {e}")
+            return None
+
+        now = time.time()
+        snapshot["cookies"] = [
+            c for c in snapshot.get("cookies", []) if not (c.get("expires", -1) > 0 and c["expires"] < now)
+        ]
+        return snapshot if snapshot["cookies"] else None
+
+    def save(self, email, snapshot):
+        path = self._path(email)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.fernet.encrypt(json.dumps(snapshot).encode("utf-8")))
+        os.replace(tmp_path, path)
+
+    def discard(self, email):
+        try:
+            os.remove(self._path(email))
+        except FileNotFoundError:
+            pass
+
+def create_session_store():
+    passphrase = os.getenv('LEAFLOW_SESSION_KEY', '')  # 快照加密口令，设置后启用会话持久化
+    if not passphrase:
+        return None
+    if Fernet is None:
+        logger.warning("⚠️ 已设置 LEAFLOW_SESSION_KEY 但未安装 cryptography，会话持久化已禁用")
+        return None
+    return SessionStore(os.getenv('LEAFLOW_SESSION_DIR', '.leaflow_sessions'), passphrase)
+
+session_store = create_session_store()
+
+class SharedRateLimiter:
+    """
+    跨进程共享的限速器：所有进程打开 leaflow.net 页面的间隔不少于 1/rate 秒。
+    下一个可用时间点保存在共享内存中，由其自带的锁保护；rate <= 0 表示不限速。
+    """
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_time = multiprocessing.Value('d', 0.0)
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self.next_time.get_lock():
+            now = time.time()
+            slot = max(now, self.next_time.value)
+            self.next_time.value = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+# -------------------------------
+# API 签到：登录后从浏览器取出 Cookie，签到与余额查询直接发 HTTP 请求，不再驱动页面
+# auto（默认）API 无法确认结果时回退到浏览器流程；off 始终使用浏览器
+API_MODE = os.getenv('LEAFLOW_API_MODE', 'auto')
+# 签到接口地址；签到页按钮不在表单中（由脚本提交）时使用，默认为空即只提交页面表单
+CHECKIN_API_URL = os.getenv('LEAFLOW_CHECKIN_API', '')
+
+# 所有账号的 API 会话共用同一个连接池
+api_adapter = HTTPAdapter(pool_connections=2, pool_maxsize=4)
+
+CHECKIN_BUTTON_RE = re.compile(r'<button\b([^>]*class="[^"]*\bcheckin-btn\b[^"]*"[^>]*)>(.*?)</button>', re.S | re.I)
+FORM_RE = re.compile(r'<form\b([^>]*)>(.*?)</form>', re.S | re.I)
+INPUT_RE = re.compile(r'<(?:input|button)\b([^>]*)>', re.I)
+ATTR_RE = re.compile(r'([\w-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+TAG_RE = re.compile(r'<script\b.*?</script>|<style\b.*?</style>|<[^>]+>', re.S | re.I)
+BALANCE_RE = re.compile(r'[¥￥]\s*(\d+(?:\.\d+)?)|(\d+(?:\.\d+)?)\s*元')
+CURRENCY_RE = re.compile(r'[¥￥元]')
+NUMBER_RE = re.compile(r'\d+\.?\d*')
+QUOTED_RE = re.compile(r'"[^"]*"|\'[^\']*\'')
+# 真正的 disabled 属性：属性名独立出现，不含 class 值里的 disabled:opacity-50、data-disabled-*、:disabled 绑定
+DISABLED_RE = re.compile(r'(?:^|\s)disabled(?=[\s=/]|$)', re.I)
+RESULT_KEYWORDS = ["成功", "签到", "获得", "恭喜", "谢谢", "感谢", "完成", "已签到", "连续签到"]
+
+def _attrs(tag_body):
+    return {name.lower(): unescape(v1 or v2) for name, v1, v2 in ATTR_RE.findall(tag_body)}
+
+def _page_lines(html):
+    """去掉标签后的非空文本行"""
+    text = unescape(TAG_RE.sub('\n', html))
+    return [line.strip() for line in text.split('\n') if line.strip()]
+
+def parse_balance(text):
+    """从文本中解析余额数字：优先取紧挨货币符号的数字，其次取含货币符号文本中的第一个数字"""
+    match = BALANCE_RE.search(text)
+    if match:
+        return match.group(1) or match.group(2)
+    if CURRENCY_RE.search(text):
+        match = NUMBER_RE.search(text)
+        if match:
+            return match.group(0)
+    return None
+
+def find_result_line(lines):
+    """与浏览器流程相同的关键词规则，从页面文本中提取签到结果"""
+    for keyword in RESULT_KEYWORDS:
+        for line in lines:
+            if keyword in line and len(line) < 100:  # 避免提取过长的文本
+                return line
+    return None
+
+class LeaflowApiClient:
+    """
+    用浏览器登录后的 Cookie 直接调用签到页与仪表板，返回值与浏览器流程一致；
+    无法确认结果时返回 None，由调用方回退到浏览器流程。
+    """
+    def __init__(self, cookies, user_agent, rate_limiter=None, timeout=15):
+        self.rate_limiter = rate_limiter
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.mount("https://", api_adapter)
+        self.session.mount("http://", api_adapter)
+        self.session.headers.update({"User-Agent": user_agent, "Accept-Language": "zh-CN,zh;q=0.9"})
+        for cookie in cookies:
+            self.session.cookies.set(
+                cookie["name"], cookie["value"],
+                domain=cookie.get("domain", ""), path=cookie.get("path", "/")
+            )
+
+    @classmethod
+    def from_driver(cls, driver, rate_limiter=None):
+        """取出浏览器中所有站点的 Cookie（含 HttpOnly），而不只是当前页面域名下的"""
+        cookies = driver.execute_cdp_cmd("Network.getAllCookies", {}).get("cookies", [])
+        user_agent = driver.execute_script("return navigator.userAgent")
+        return cls(cookies, user_agent, rate_limiter)
+
+    def close(self):
+        self.session.close()
+
+    def request(self, method, url, **kwargs):
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        resp = self.session.request(method, url, timeout=self.timeout, **kwargs)
+        if "charset" not in resp.headers.get("Content-Type", "").lower():
+            resp.encoding = "utf-8"  # 未声明编码时 requests 会按 ISO-8859-1 解码，中文会乱码
+        return resp
+
+    @staticmethod
+    def is_login_page(resp):
+        parts = urlsplit(resp.url)
+        return parts.hostname == "leaflow.net" and "login" in parts.path
+
+    @staticmethod
+    def is_checked_in(button):
+        """
+        与浏览器流程相同的规则：按钮带有 disabled 属性，且显示已签到或 class 中有 disabled。
+        仅有 disabled 属性不算（加载中、等待脚本接管时按钮也可能被禁用）；判断属性时先去掉属性值，只看属性名
+        """
+        attrs = QUOTED_RE.sub('""', button.group(1))
+        if not DISABLED_RE.search(attrs):
+            return False
+        classes = _attrs(button.group(1)).get("class", "").split()
+        return "已签到" in TAG_RE.sub('', button.group(2)) or "disabled" in classes
+
+    @staticmethod
+    def json_succeeded(data):
+        """按常见状态字段判断 JSON 结果：success / code / status，成功返回 True，失败返回 False，没有这些字段返回 None"""
+        if "success" in data:
+            return data["success"] is True or str(data["success"]).lower() in ("1", "true")
+        if "code" in data:
+            return str(data["code"]) in ("0", "200")
+        if "status" in data:
+            return str(data["status"]).lower() in ("0", "200", "ok", "success", "true")
+        return None
+
+    def checkin(self):
+        """签到，返回结果消息；页面结构或结果无法识别时返回 None"""
+        resp = self.request("GET", LeaflowAutoCheckin.CHECKIN_URL)
+        if resp.status_code != 200 or self.is_login_page(resp):
+            return None
+
+        html = resp.text
+        button = CHECKIN_BUTTON_RE.search(html)
+        if not button:
+            return None
+        button_attrs = _attrs(button.group(1))
+        if self.is_checked_in(button):
+            return "今日已签到"
+
+        # 找到包含签到按钮的表单，按原样提交（含隐藏字段与按钮自身的 name/value）
+        form = next((f for f in FORM_RE.finditer(html) if f.start() < button.start() < f.end()), None)
+        if form:
+            form_attrs = _attrs(form.group(1))
+            payload = {}
+            for field in INPUT_RE.finditer(form.group(2)):
+                attrs = _attrs(field.group(1))
+                if attrs.get("name") and attrs.get("type", "").lower() not in ("checkbox", "radio", "submit", "button"):
+                    payload[attrs["name"]] = attrs.get("value", "")
+            if button_attrs.get("name"):
+                payload[button_attrs["name"]] = button_attrs.get("value", "")
+            url = urljoin(resp.url, form_attrs.get("action") or resp.url)
+            method = form_attrs.get("method", "get").upper()
+        elif CHECKIN_API_URL:
+            url, method, payload = CHECKIN_API_URL, "POST", {}
+        else:
+            return None
+
+        if method == "POST":
+            result = self.request("POST", url, data=payload, headers={"Referer": resp.url})
+        else:
+            result = self.request("GET", url, params=payload, headers={"Referer": resp.url})
+        if result.status_code != 200 or self.is_login_page(result):
+            return None
+
+        if "json" in result.headers.get("Content-Type", ""):
+            try:
+                data = result.json()
+            except ValueError:
+                data = None
+            if not isinstance(data, dict):
+                return None
+            succeeded = self.json_succeeded(data)
+            if succeeded is False:
+                return None  # HTTP 200 的错误结果，交给浏览器流程处理
+            message = data.get("message") or data.get("msg")
+            if succeeded and message:
+                return str(message)
+            # 没有状态字段或没有消息时不凭 JSON 判断，按下面的按钮状态确认
+
+        # 返回的是 HTML 时不从页面文字里找关键词（签到页标题本身就含"签到"），
+        # 只认签到按钮从未签到变为已签到：先看响应本身，再重新打开签到页确认
+        button = CHECKIN_BUTTON_RE.search(result.text)
+        if not (button and self.is_checked_in(button)):
+            page = self.request("GET", LeaflowAutoCheckin.CHECKIN_URL)
+            button = CHECKIN_BUTTON_RE.search(page.text) if page.status_code == 200 else None
+        if button and self.is_checked_in(button):
+            return "⚠️ 签到完成，但未找到具体结果消息"
+        return None
+
+    def get_balance(self):
+        """获取余额，页面中没有服务端渲染的余额时返回 None"""
+        resp = self.request("GET", "https://leaflow.net/dashboard")
+        if resp.status_code != 200 or self.is_login_page(resp):
+            return None
+        for line in _page_lines(resp.text):
+            balance = parse_balance(line)
+            if balance:
+                return f"{balance}元"
+        return None
+
+class DriverManager:
+    """
+    多账号共用一个 Chrome：首次使用时启动，账号之间清空 Cookie、本地存储并换用新标签页，
+    Chrome 冷启动（数秒、数百 MB 内存）每次运行只发生一次；浏览器异常退出时自动重建。
+    """
+    def __init__(self):
+        self.driver = None
+
+    def get(self):
+        if self.driver is None or not self.is_alive():
+            if self.driver is not None:
+                logger.warning("⚠️ 浏览器已退出，重新启动")
+                self.close()
+            logger.info("🚀 启动 Chrome 浏览器")
+            self.driver = create_driver()
+        return self.driver
+
+    def is_alive(self):
+        try:
+            self.driver.window_handles
+            return True
+        except Exception:
+            return False
+
+    def reset(self):
+        """清理上一个账号留下的登录状态，供下一个账号使用"""
+        if self.driver is None or not self.is_alive():
+            return
+        try:
+            # sessionStorage 属于标签页且不在 CDP 的 "all" 清理范围内，换用新标签页并关闭旧的全部窗口
+            old_handles = self.driver.window_handles
+            self.driver.switch_to.new_window("tab")
+            fresh = self.driver.current_window_handle
+            for handle in old_handles:
+                self.driver.switch_to.window(handle)
+                self.driver.close()
+            self.driver.switch_to.window(fresh)
+            clear_browser_state(self.driver)
+            self.driver.get("about:blank")
+        except Exception as e:
+            # 清理失败时不冒险复用，下次 get() 重新启动浏览器
+            logger.warning(f"⚠️ 清理浏览器状态失败，将重启浏览器: {e}")
+            self.close()
+
+    def close(self):
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+            self.driver = None
+
 class LeaflowAutoCheckin:
     # 配置class类常量
     LOGIN_URL = "https://leaflow.net/login"
     CHECKIN_URL = "https://checkin.leaflow.net"
-    WAIT_TIME_AFTER_LOGIN = 15  # 登录后等待的秒数
-    WAIT_TIME_AFTER_CHECKIN_CLICK = 5  # 点击签到后等待的秒数
-    RETRY_WAIT_TIME_PAGE_LOAD = 15 # 签到页面加载每次重试等待时间
+    # 以下等待时间均为上限：条件满足即继续，不会固定等满
+    WAIT_TIME_AFTER_LOGIN = 15  # 登录后等待跳转的最长秒数
+    WAIT_TIME_AFTER_CHECKIN_CLICK = 5  # 点击签到后等待结果出现的最长秒数
+    RETRY_WAIT_TIME_PAGE_LOAD = 15 # 签到页面加载每次尝试的最长等待秒数
     RETRY_COUNT_PAGE_LOAD = 3 # 签到页面加载重试次数
+    WAIT_TIME_PAGE_LOAD = 10  # 页面加载完成（document.readyState）的最长等待秒数
+    WAIT_TIME_POPUP = 3  # 等待初始弹窗出现/消失的最长秒数
+    WAIT_TIME_RESULT = 3  # 查找签到结果消息的最长秒数
+    POLL_INTERVAL = 0.2  # 条件轮询间隔，单位：秒
+
+    # 候选选择器：按优先级排列，"//" 开头为 XPath，其余为 CSS
+    POPUP_SELECTORS = [
+        "[role='dialog']",
+        ".modal",
+        "[class*='popup']",
+        "[class*='dialog']",
+    ]
+    EMAIL_SELECTORS = [
+        "input[type='text']",
+        "input[type='email']",
+        "input[placeholder*='邮箱']",
+        "input[placeholder*='邮件']",
+        "input[placeholder*='email']",
+        "input[name='email']",
+        "input[name='username']",
+    ]
+    LOGIN_BUTTON_SELECTORS = [
+        "//button[contains(text(), '登录')]",
+        "//button[contains(text(), 'Login')]",
+        "//button[@type='submit']",
+        "//input[@type='submit']",
+        "button[type='submit']",
+    ]
+    LOGIN_ERROR_SELECTORS = [".error", ".alert-danger", "[class*='error']", "[class*='danger']"]
+    BALANCE_SELECTORS = [
+        "//*[contains(text(), '¥') or contains(text(), '￥') or contains(text(), '元')]",
+        "//*[contains(@class, 'balance')]",
+        "//*[contains(@class, 'money')]",
+        "//*[contains(@class, 'amount')]",
+        "//button[contains(@class, 'dollar')]",
+        "//span[contains(@class, 'font-medium')]",
+    ]
+    CHECKIN_INDICATORS = [
+        "button.checkin-btn",  # 优先使用这个选择器
+        "//button[contains(text(), '立即签到')]",
+        "//*[contains(text(), '每日签到')]",
+        "//*[contains(text(), '签到')]",
+    ]
+    RESULT_SELECTORS = [
+        ".alert-success",
+        ".success",
+        ".message",
+        "[class*='success']",
+        "[class*='message']",
+        ".modal-content",  # 弹窗内容
+        ".ant-message",    # Ant Design 消息
+        ".el-message",     # Element UI 消息
+        ".toast",          # Toast消息
+        ".notification",   # 通知
+    ]
+    SNAPSHOT_MAX_ITEMS = 300  # 页面快照中每组最多返回的元素数
+    SNAPSHOT_MAX_TEXT = 200  # 页面快照中单个元素文本的最大长度
 
-    def __init__(self, email, password):
+    def __init__(self, email, password, driver_manager=None, rate_limiter=None):
         self.email = email
         self.password = password
         self.telegram_bot_token = os.getenv('TG_BOT_TOKEN', '')
@@ -40,41 +702,51 @@ class LeaflowAutoCheckin:
             raise ValueError("邮箱和密码不能为空")
         
         self.driver = None
+        self.driver_manager = driver_manager
+        self.rate_limiter = rate_limiter
+        self.local_storage = {}
+        self.result_baseline = set()  # 点击签到前页面上已有的结果候选文本，点击后只认新出现的
+        self.profiler = PhaseProfiler()
         self.setup_driver()
     
+    @profiled("setup_driver")
     def setup_driver(self):
-        """设置Chrome驱动选项"""
-        chrome_options = Options()
-        
-        # GitHub Actions环境配置
-        if os.getenv('GITHUB_ACTIONS'):
-            chrome_options.add_argument('--headless')
-            chrome_options.add_argument('--no-sandbox')
-            chrome_options.add_argument('--disable-dev-shm-usage')
-            chrome_options.add_argument('--disable-gpu')
-            chrome_options.add_argument('--window-size=1920,1080')
-        
-        # 通用配置
-        chrome_options.add_argument('--disable-blink-features=AutomationControlled')
-        chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        chrome_options.add_experimental_option('useAutomationExtension', False)
-        
-        self.driver = webdriver.Chrome(options=chrome_options)
-        self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+        """设置Chrome驱动：传入 driver_manager 时复用其中的浏览器，否则单独启动一个"""
+        if self.driver_manager:
+            self.driver = self.driver_manager.get()
+        else:
+            self.driver = create_driver()
+        # 之后的每条 WebDriver 命令都计入本账号当前所在的阶段
+        instrument_driver(self.driver)
+        self.driver.command_listener = self.profiler.count_command
+    
+    def release_driver(self):
+        """账号处理结束：共用的浏览器只清理状态，自己启动的浏览器直接退出"""
+        if self.driver is not None:
+            self.driver.command_listener = None
+        if self.driver_manager:
+            self.driver_manager.reset()
+        elif self.driver:
+            self.driver.quit()
+        self.driver = None
         
     def close_popup(self):
         """关闭初始弹窗"""
         try:
             logger.info("👉 尝试关闭初始弹窗...")
-            time.sleep(3)  # 等待弹窗加载
+            # 等待弹窗出现（最多 WAIT_TIME_POPUP 秒），没有弹窗时同样点击一次空白处
+            popup = self.resolve("login.popup", self.POPUP_SELECTORS, self.WAIT_TIME_POPUP)
             
             # 尝试点击页面左上角空白处关闭弹窗
             try:
                 actions = ActionChains(self.driver)
-                # 点击页面左上角(10,10)位置
-                actions.move_by_offset(10, 10).click().perform()
+                # 点击页面左上角(10,10)位置；使用绝对坐标，复用浏览器时鼠标位置不会逐次累加
+                actions.w3c_actions.pointer_action.move_to_location(10, 10)
+                actions.w3c_actions.pointer_action.click()
+                actions.perform()
+                if popup:
+                    self.wait_until(EC.invisibility_of_element(popup), self.WAIT_TIME_POPUP)
                 logger.info("✅ 关闭弹窗成功")
-                time.sleep(2)
                 return True
             except:
                 pass
@@ -87,23 +759,91 @@ class LeaflowAutoCheckin:
     
     def wait_for_element_clickable(self, by, value, timeout=10):
         """等待元素可点击"""
-        return WebDriverWait(self.driver, timeout).until(
+        return WebDriverWait(self.driver, timeout, poll_frequency=self.POLL_INTERVAL).until(
             EC.element_to_be_clickable((by, value))
         )
     
     def wait_for_element_present(self, by, value, timeout=10):
         """等待元素出现"""
-        return WebDriverWait(self.driver, timeout).until(
+        return WebDriverWait(self.driver, timeout, poll_frequency=self.POLL_INTERVAL).until(
             EC.presence_of_element_located((by, value))
         )
     
+    def open_page(self, url):
+        """打开 leaflow.net 页面，经过共享限速器"""
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        self.driver.get(url)
+    
+    def wait_until(self, condition, timeout):
+        """以 POLL_INTERVAL 为间隔轮询 condition，满足即返回其结果；timeout 只是上限，超时返回 None"""
+        try:
+            return WebDriverWait(
+                self.driver, timeout, poll_frequency=self.POLL_INTERVAL,
+                ignored_exceptions=(NoSuchElementException, StaleElementReferenceException)
+            ).until(condition)
+        except TimeoutException:
+            return None
+    
+    def wait_for_page_ready(self, timeout=None):
+        """等待页面加载完成"""
+        return self.wait_until(
+            lambda driver: driver.execute_script("return document.readyState") == "complete",
+            timeout or self.WAIT_TIME_PAGE_LOAD
+        )
+    
+    def query_first(self, candidates, clickable=False, text_pattern=None):
+        """一次往返检查全部候选选择器，返回 (选择器, 元素)，都未命中返回 False，供 wait_until 轮询"""
+        found = self.driver.execute_script(SELECTOR_QUERY_JS, candidates, clickable, text_pattern)
+        if not found:
+            return False
+        index, element = found
+        return candidates[index], element
+    
+    def snapshot(self, groups):
+        """
+        一次往返取回页面快照。groups 为 {键: 候选选择器列表}，返回 (页面全文, {键: [(选择器, 文本), ...]})；
+        各组按选择器缓存排序，上次命中的选择器排在最前
+        """
+        ordered = {key: selector_cache.order(key, candidates) for key, candidates in groups.items()}
+        data = self.driver.execute_script(DOM_SNAPSHOT_JS, ordered, self.SNAPSHOT_MAX_ITEMS, self.SNAPSHOT_MAX_TEXT)
+        hits = {
+            key: [(ordered[key][index], text) for index, text in data["groups"].get(key, [])]
+            for key in ordered
+        }
+        return data["body"], hits
+    
+    def wait_for_snapshot_hits(self, key, candidates, timeout, exclude=()):
+        """
+        轮询页面快照直到该组候选出现可见且有文本的元素，返回 [(选择器, 文本), ...]，超时返回 None；
+        文本在 exclude 中的元素（如点击前已存在的）不计入
+        """
+        def poll(driver):
+            _, hits = self.snapshot({key: candidates})
+            return [hit for hit in hits[key] if hit[1] not in exclude] or False
+        return self.wait_until(poll, timeout)
+    
+    def resolve(self, key, candidates, timeout, clickable=False, text_pattern=None):
+        """
+        查找页面元素：上次命中的选择器排在最前，每次轮询用一个脚本调用同时检查全部候选，
+        timeout 秒内找到即返回元素并记住命中的选择器，找不到返回 None
+        """
+        ordered = selector_cache.order(key, candidates)
+        found = self.wait_until(lambda driver: self.query_first(ordered, clickable, text_pattern), timeout)
+        if not found:
+            return None
+        selector, element = found
+        selector_cache.remember(key, selector)
+        return element
+    
+    @profiled("login")
     def login(self):
         """执行登录流程"""
         logger.info(f"🔑 开始登录流程")
         
         # 访问登录页面
-        self.driver.get(self.LOGIN_URL)
-        time.sleep(5)
+        self.open_page(self.LOGIN_URL)
+        self.wait_for_page_ready()
         
         # 关闭弹窗
         self.close_popup()
@@ -111,36 +851,17 @@ class LeaflowAutoCheckin:
         # 输入邮箱
         try:
             logger.info("🔍 查找邮箱输入框...")
-            time.sleep(2)
-            
-            # 尝试多种选择器找到邮箱输入框
-            email_selectors = [
-                "input[type='text']",
-                "input[type='email']", 
-                "input[placeholder*='邮箱']",
-                "input[placeholder*='邮件']",
-                "input[placeholder*='email']",
-                "input[name='email']",
-                "input[name='username']"
-            ]
-            
-            email_input = None
-            for selector in email_selectors:
-                try:
-                    email_input = self.wait_for_element_clickable(By.CSS_SELECTOR, selector, 5)
-                    logger.info(f"✅ 找到邮箱输入框")
-                    break
-                except:
-                    continue
             
+            # 同时尝试多种选择器找到邮箱输入框
+            email_input = self.resolve("login.email", self.EMAIL_SELECTORS, 10, clickable=True)
             if not email_input:
                 raise Exception("❌ 找不到邮箱输入框")
+            logger.info(f"✅ 找到邮箱输入框")
             
             # 清除并输入邮箱
             email_input.clear()
             email_input.send_keys(self.email)
             logger.info("✅ 邮箱输入完成")
-            time.sleep(2)
             
         except Exception as e:
             logger.error(f"❌ 输入邮箱时出错: {e}")
@@ -148,7 +869,6 @@ class LeaflowAutoCheckin:
             try:
                 self.driver.execute_script(f"document.querySelector('input[type=\"text\"], input[type=\"email\"]').value = '{self.email}';")
                 logger.info("👉 通过JavaScript设置邮箱")
-                time.sleep(2)
             except:
                 raise Exception(f"❌ 无法输入邮箱: {e}")
         
@@ -163,7 +883,6 @@ class LeaflowAutoCheckin:
             password_input.clear()
             password_input.send_keys(self.password)
             logger.info("✅ 密码输入完成")
-            time.sleep(1)
             
         except TimeoutException:
             raise Exception("❌ 找不到密码输入框")
@@ -171,28 +890,10 @@ class LeaflowAutoCheckin:
         # 点击登录按钮
         try:
             logger.info("🔍 查找登录按钮...")
-            login_btn_selectors = [
-                "//button[contains(text(), '登录')]",
-                "//button[contains(text(), 'Login')]",
-                "//button[@type='submit']",
-                "//input[@type='submit']",
-                "button[type='submit']"
-            ]
-            
-            login_btn = None
-            for selector in login_btn_selectors:
-                try:
-                    if selector.startswith("//"):
-                        login_btn = self.wait_for_element_clickable(By.XPATH, selector, 5)
-                    else:
-                        login_btn = self.wait_for_element_clickable(By.CSS_SELECTOR, selector, 5)
-                    logger.info(f"✅ 找到登录按钮")
-                    break
-                except:
-                    continue
-            
+            login_btn = self.resolve("login.submit", self.LOGIN_BUTTON_SELECTORS, 10, clickable=True)
             if not login_btn:
                 raise Exception("❌ 找不到登录按钮")
+            logger.info(f"✅ 找到登录按钮")
             
             login_btn.click()
             logger.info("✅ 已点击登录按钮")
@@ -202,7 +903,7 @@ class LeaflowAutoCheckin:
         
         # 等待登录完成
         try:
-            WebDriverWait(self.driver, self.WAIT_TIME_AFTER_LOGIN).until(
+            WebDriverWait(self.driver, self.WAIT_TIME_AFTER_LOGIN, poll_frequency=self.POLL_INTERVAL).until(
                 lambda driver: "dashboard" in driver.current_url or "workspaces" in driver.current_url or "login" not in driver.current_url
             )
             
@@ -215,60 +916,124 @@ class LeaflowAutoCheckin:
                 raise Exception("⚠️ 登录后未跳转到正确页面")
                 
         except TimeoutException:
-            # 检查是否登录失败
-            try:
-                error_selectors = [".error", ".alert-danger", "[class*='error']", "[class*='danger']"]
-                for selector in error_selectors:
-                    try:
-                        error_msg = self.driver.find_element(By.CSS_SELECTOR, selector)
-                        if error_msg.is_displayed():
-                            raise Exception(f"❌ 登录失败: {error_msg.text}")
-                    except:
-                        continue
-                raise Exception("⚠️ 登录超时，无法确认登录状态")
-            except Exception as e:
-                raise e
+            # 检查是否登录失败：一次查询全部错误提示选择器
+            found = self.query_first(self.LOGIN_ERROR_SELECTORS, text_pattern=r"\S")
+            if found:
+                raise Exception(f"❌ 登录失败: {found[1].text}")
+            raise Exception("⚠️ 登录超时，无法确认登录状态")
 
+    def wait_for_dashboard(self):
+        """打开仪表板并判断是否处于登录状态：出现金额文本为已登录，跳转到登录页或超时为未登录"""
+        self.open_page("https://leaflow.net/dashboard")
+        state = self.wait_until(
+            lambda driver: "login" if "login" in urlsplit(driver.current_url).path else driver.execute_script(
+                "const t = document.body ? document.body.innerText : '';"
+                "return /[¥￥元]/.test(t) && /\\d/.test(t) ? 'dashboard' : false;"
+            ),
+            self.WAIT_TIME_PAGE_LOAD
+        )
+        return state == "dashboard"
+    
+    @profiled("restore_session")
+    def restore_session(self):
+        """用保存的快照恢复登录状态，仪表板能以登录状态打开时返回 True，跳过登录流程"""
+        snapshot = session_store.load(self.email) if session_store else None
+        if not snapshot:
+            return False
+        
+        logger.info("🍪 尝试使用已保存的登录状态")
+        script_id = None
+        try:
+            cookies = [{k: c[k] for k in COOKIE_PARAM_KEYS if k in c} for c in snapshot["cookies"]]
+            for c in cookies:
+                if c.get("expires", -1) <= 0:
+                    c.pop("expires", None)  # 会话 Cookie
+            self.driver.execute_cdp_cmd("Network.setCookies", {"cookies": cookies})
+            
+            # localStorage 只能在对应源的页面中写入：注入一段在页面脚本之前执行的代码
+            local_storage = snapshot.get("local_storage") or {}
+            if local_storage:
+                seed = (
+                    f"const saved = {json.dumps(local_storage)}[location.origin];"
+                    "if (saved) { for (const [k, v] of Object.entries(saved)) {"
+                    " if (localStorage.getItem(k) === null) localStorage.setItem(k, v); } }"
+                )
+                script_id = self.driver.execute_cdp_cmd(
+                    "Page.addScriptToEvaluateOnNewDocument", {"source": seed}
+                ).get("identifier")
+            
+            if self.wait_for_dashboard():
+                logger.info(f"✅ 已恢复登录状态，跳过登录，当前URL: {self.driver.current_url}")
+                self.local_storage = local_storage
+                return True
+        except Exception as e:
+            logger.warning(f"⚠️ 恢复登录状态出错: {e}")
+        finally:
+            if script_id:
+                # 注入脚本只对本账号生效，避免复用浏览器时影响下一个账号
+                try:
+                    self.driver.execute_cdp_cmd("Page.removeScriptToEvaluateOnNewDocument", {"identifier": script_id})
+                except Exception:
+                    pass
+        
+        logger.info("👉 已保存的登录状态失效，重新登录")
+        session_store.discard(self.email)
+        clear_browser_state(self.driver)
+        return False
+    
+    def capture_local_storage(self):
+        """记录当前页面所在源的 localStorage，用于保存快照"""
+        try:
+            origin = self.driver.execute_script("return location.origin")
+            if origin in LEAFLOW_ORIGINS:
+                self.local_storage[origin] = self.driver.execute_script(
+                    "const d = {}; for (let i = 0; i < localStorage.length; i++) {"
+                    " const k = localStorage.key(i); d[k] = localStorage.getItem(k); } return d;"
+                )
+        except Exception as e:
+            logger.warning(f"⚠️ 读取 localStorage 失败: {e}")
+    
+    def save_session(self):
+        """账号处理成功后保存加密快照：所有 Leaflow 域名下的 Cookie 与已记录的 localStorage"""
+        if not session_store:
+            return
+        try:
+            self.capture_local_storage()
+            cookies = [
+                c for c in self.driver.execute_cdp_cmd("Network.getAllCookies", {}).get("cookies", [])
+                if c.get("domain", "").lstrip(".").endswith("leaflow.net")
+            ]
+            session_store.save(self.email, {"cookies": cookies, "local_storage": self.local_storage, "saved_at": time.time()})
+            logger.info("🍪 已保存登录状态")
+        except Exception as e:
+            logger.warning(f"⚠️ 保存登录状态失败: {e}")
+    
+    @profiled("get_balance")
     def get_balance(self):
         """获取当前账号的总余额"""
         try:
             logger.info("💰 获取账号余额...")
             
             # 跳转到仪表板页面
-            self.driver.get("https://leaflow.net/dashboard")
-            time.sleep(3)
+            self.open_page("https://leaflow.net/dashboard")
             
-            # 等待页面加载
-            WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.TAG_NAME, "body"))
+            # 等待页面中出现金额文本（最多 WAIT_TIME_PAGE_LOAD 秒）
+            self.wait_until(
+                lambda driver: driver.execute_script(
+                    "const t = document.body ? document.body.innerText : '';"
+                    "return /[¥￥元]/.test(t) && /\\d/.test(t);"
+                ),
+                self.WAIT_TIME_PAGE_LOAD
             )
             
-            # 尝试多种选择器查找余额元素
-            balance_selectors = [
-                "//*[contains(text(), '¥') or contains(text(), '￥') or contains(text(), '元')]",
-                "//*[contains(@class, 'balance')]",
-                "//*[contains(@class, 'money')]",
-                "//*[contains(@class, 'amount')]",
-                "//button[contains(@class, 'dollar')]",
-                "//span[contains(@class, 'font-medium')]"
-            ]
-            
-            for selector in balance_selectors:
-                try:
-                    elements = self.driver.find_elements(By.XPATH, selector)
-                    for element in elements:
-                        text = element.text.strip()
-                        # 查找包含数字和货币符号的文本
-                        if any(char.isdigit() for char in text) and ('¥' in text or '￥' in text or '元' in text):
-                            # 提取数字部分
-                            import re
-                            numbers = re.findall(r'\d+\.?\d*', text)
-                            if numbers:
-                                balance = numbers[0]
-                                logger.info(f"💰 找到余额: {balance}元")
-                                return f"{balance}元"
-                except:
-                    continue
+            # 一次取回全部候选元素的文本，在本地解析余额
+            _, hits = self.snapshot({"dashboard.balance": self.BALANCE_SELECTORS})
+            for selector, text in hits["dashboard.balance"]:
+                balance = parse_balance(text)
+                if balance:
+                    selector_cache.remember("dashboard.balance", selector)
+                    logger.info(f"💰 找到余额: {balance}元")
+                    return f"{balance}元"
             
             logger.warning("未找到余额信息")
             return "未知"
@@ -277,6 +1042,7 @@ class LeaflowAutoCheckin:
             logger.warning(f"获取余额时出错: {e}")
             return "未知"
     
+    @profiled("wait_for_checkin_page_loaded")
     def wait_for_checkin_page_loaded(self, max_retries=None, wait_time=None):
         """等待签到页面完全加载，支持重试"""
         
@@ -285,34 +1051,13 @@ class LeaflowAutoCheckin:
         wait_time = wait_time if wait_time is not None else self.RETRY_WAIT_TIME_PAGE_LOAD
         
         for attempt in range(max_retries):
-            logger.info(f"⏳ 等待签到页面加载，尝试 {attempt + 1}/{max_retries}，等待 {wait_time} 秒...")
-            time.sleep(wait_time)
+            logger.info(f"⏳ 等待签到页面加载，尝试 {attempt + 1}/{max_retries}，最长等待 {wait_time} 秒...")
             
             try:
-                # 检查页面是否包含签到相关元素
-                checkin_indicators = [
-                    "button.checkin-btn",  # 优先使用这个选择器
-                    "//button[contains(text(), '立即签到')]",
-                    "//*[contains(text(), '每日签到')]",
-                    "//*[contains(text(), '签到')]"
-                ]
-                
-                for indicator in checkin_indicators:
-                    try:
-                        if indicator.startswith("//"):
-                            element = WebDriverWait(self.driver, 10).until(
-                                EC.presence_of_element_located((By.XPATH, indicator))
-                            )
-                        else:
-                            element = WebDriverWait(self.driver, 10).until(
-                                EC.presence_of_element_located((By.CSS_SELECTOR, indicator))
-                            )
-                        
-                        if element.is_displayed():
-                            logger.info(f"✅ 找到签到页面元素")
-                            return True
-                    except:
-                        continue
+                # 每次轮询依次检查全部签到相关元素，任一可见即返回
+                if self.resolve("checkin.indicator", self.CHECKIN_INDICATORS, wait_time):
+                    logger.info(f"✅ 找到签到页面元素")
+                    return True
                 
                 logger.warning(f"⏳ 第 {attempt + 1} 次尝试未找到签到按钮，继续等待...")
                 
@@ -321,13 +1066,16 @@ class LeaflowAutoCheckin:
         
         return False
     
+    @profiled("find_and_click_checkin_button")
     def find_and_click_checkin_button(self):
         """查找并点击签到按钮 - 使用和单账号成功时相同的逻辑"""
         logger.info("🔍 查找立即签到按钮...")
         
         try:
-            time.sleep(5)
-            checkin_btn = self.wait_for_element_present(By.CSS_SELECTOR, "button.checkin-btn", 10)
+            # 等待按钮可见且文字已渲染（已签到/立即签到），代替固定等待
+            checkin_btn = self.resolve("checkin.button", ["button.checkin-btn"], 10, text_pattern=r"\S")
+            if not checkin_btn:
+                raise TimeoutException()
 
             # 判断是否已经签到
             if not checkin_btn.is_enabled() and ("已签到" in checkin_btn.text or "disabled" in checkin_btn.get_attribute("class")):
@@ -337,6 +1085,7 @@ class LeaflowAutoCheckin:
             # 尝试点击签到按钮
             if checkin_btn.is_displayed() and checkin_btn.is_enabled():
                 logger.info("👉 找到并点击 '立即签到' 按钮")
+                self.capture_result_baseline()
                 checkin_btn.click()
                 return "CLICK_SUCCESS" # 返回成功点击标记
 
@@ -353,7 +1102,7 @@ class LeaflowAutoCheckin:
     def checkin(self):
         """执行签到流程"""
         logger.info("👉 跳转到签到页面...")
-        self.driver.get(self.CHECKIN_URL)
+        self.open_page(self.CHECKIN_URL)
         
         # 等待签到页面加载（最多重试3次，每次等待20秒）
         if not self.wait_for_checkin_page_loaded():
@@ -368,71 +1117,94 @@ class LeaflowAutoCheckin:
             raise Exception("⚠️ 找不到立即签到按钮或按钮不可点击")
         
         logger.info("👉 已点击立即签到按钮")
-        time.sleep(self.WAIT_TIME_AFTER_CHECKIN_CLICK)
+        self.wait_for_checkin_outcome()
         
         # 获取签到结果
         result_message = self.get_checkin_result()
         return result_message
     
+    def capture_result_baseline(self):
+        """记录点击前页面上已有的结果候选文本与页面文本行，页面自带的 success/message 元素不会被当成签到结果"""
+        body, hits = self.snapshot({"checkin.result": self.RESULT_SELECTORS})
+        self.result_baseline = {text for _, text in hits["checkin.result"]}
+        self.result_baseline.update(line.strip() for line in body.split('\n'))
+    
+    def wait_for_checkin_outcome(self):
+        """
+        点击签到后等待按钮变为已签到，或出现点击前不存在的结果消息，最多 WAIT_TIME_AFTER_CHECKIN_CLICK 秒。
+        只看"已签到"文字而不看 disabled：提交请求期间按钮也可能暂时不可点击
+        """
+        def settled(driver):
+            buttons = driver.find_elements(By.CSS_SELECTOR, "button.checkin-btn")
+            if buttons and "已签到" in buttons[0].text:
+                return True
+            _, hits = self.snapshot({"checkin.result": self.RESULT_SELECTORS})
+            return any(text not in self.result_baseline for _, text in hits["checkin.result"])
+        
+        return self.wait_until(settled, self.WAIT_TIME_AFTER_CHECKIN_CLICK)
+    
+    @profiled("get_checkin_result")
     def get_checkin_result(self):
         """获取签到结果消息"""
         try:
-            time.sleep(3)
-            
-            # 尝试查找各种可能的成功消息元素
-            success_selectors = [
-                ".alert-success",
-                ".success",
-                ".message",
-                "[class*='success']",
-                "[class*='message']",
-                ".modal-content",  # 弹窗内容
-                ".ant-message",    # Ant Design 消息
-                ".el-message",     # Element UI 消息
-                ".toast",          # Toast消息
-                ".notification"    # 通知
-            ]
-            
-            for selector in success_selectors:
-                try:
-                    element = self.driver.find_element(By.CSS_SELECTOR, selector)
-                    if element.is_displayed():
-                        text = element.text.strip()
-                        if text:
-                            return text
-                except:
-                    continue
-            
-            # 如果没有找到特定元素，检查页面文本
-            page_text = self.driver.find_element(By.TAG_NAME, "body").text
-            important_keywords = ["成功", "签到", "获得", "恭喜", "谢谢", "感谢", "完成", "已签到", "连续签到"]
+            # 轮询页面快照直到出现点击后新增的结果消息元素，最多 WAIT_TIME_RESULT 秒；每次轮询只有一次往返
+            found = self.wait_for_snapshot_hits("checkin.result", self.RESULT_SELECTORS, self.WAIT_TIME_RESULT,
+                                                exclude=self.result_baseline)
+            if found:
+                selector, text = found[0]
+                selector_cache.remember("checkin.result", selector)
+                return text
             
-            for keyword in important_keywords:
-                if keyword in page_text:
-                    # 提取包含关键词的行
-                    lines = page_text.split('\n')
-                    for line in lines:
-                        if keyword in line and len(line.strip()) < 100:  # 避免提取过长的文本
-                            return line.strip()
+            # 如果没有找到特定元素，从点击后新增的页面文本行中提取包含关键词的行
+            body, _ = self.snapshot({})
+            lines = [line.strip() for line in body.split('\n')]
+            line = find_result_line([line for line in lines if line not in self.result_baseline])
+            if line:
+                return line
             
             return "⚠️ 签到完成，但未找到具体结果消息"
             
         except Exception as e:
             return f"❌ 获取签到结果时出错: {str(e)}"
     
+    @profiled("api_checkin")
+    def api_checkin(self):
+        """通过 API 签到并获取余额，返回 (result, balance)，无法确认结果时 result 为 None"""
+        api = None
+        result = balance = None
+        try:
+            api = LeaflowApiClient.from_driver(self.driver, self.rate_limiter)
+            result = api.checkin()
+            if result:
+                logger.info("⚡ 已通过 API 完成签到")
+                balance = api.get_balance()
+            else:
+                logger.info("↪️ API 签到结果无法确认，改用浏览器签到")
+        except Exception as e:
+            logger.warning(f"⚠️ API 签到出错，改用浏览器签到: {e}")
+        finally:
+            if api:
+                api.close()
+        return result, balance
+    
     def run(self):
         """单个账号执行流程"""
         try:
             logger.info(f"⏳ 开始处理账号")
             
-            # 登录
-            if self.login():
+            # 登录：已保存的登录状态有效时跳过
+            if self.restore_session() or self.login():
+                self.capture_local_storage()
+                result, balance = self.api_checkin() if API_MODE != 'off' else (None, None)
                 # 签到
-                result = self.checkin()
+                if not result:
+                    result = self.checkin()
                 logger.info(f"📋 签到结果: {result}")
                 # 获取余额
-                balance = self.get_balance()
+                if not balance:
+                    balance = self.get_balance()
                 logger.info(f"📋 签到结果: {result}, 💰 余额: {balance}")
+                self.save_session()
                 return True, result, balance
             else:
                 raise Exception("❌ 登录失败")
@@ -443,8 +1215,35 @@ class LeaflowAutoCheckin:
             return False, error_msg, "未知"
         
         finally:
-            if self.driver:
-                self.driver.quit()
+            selector_cache.save()
+            self.release_driver()
+
+# 并发模式下每个工作进程各自持有的浏览器与限速器
+_worker_driver_manager = None
+_worker_rate_limiter = None
+
+def _init_checkin_worker(rate_limiter, reuse_browser):
+    """工作进程初始化：每个进程复用自己的一个 Chrome，进程退出时关闭"""
+    global _worker_driver_manager, _worker_rate_limiter
+    _worker_rate_limiter = rate_limiter
+    if reuse_browser:
+        _worker_driver_manager = DriverManager()
+        Finalize(None, _worker_driver_manager.close, exitpriority=10)
+
+def _checkin_worker(index, email, password, stagger):
+    """在工作进程中签到单个账号，返回 ((email, success, result, balance), 阶段统计)"""
+    # 错开各进程的首个账号，避免同时启动浏览器、同时登录
+    if stagger:
+        time.sleep(stagger)
+    auto_checkin = None
+    try:
+        auto_checkin = LeaflowAutoCheckin(email, password, _worker_driver_manager, _worker_rate_limiter)
+        success, result, balance = auto_checkin.run()
+        return (email, success, result, balance), auto_checkin.profiler.to_dict()
+    except Exception as e:
+        error_msg = f"❌ 处理账号时发生异常: {str(e)}"
+        logger.error(error_msg)
+        return (email, False, error_msg, "未知"), auto_checkin.profiler.to_dict() if auto_checkin else {}
 
 class MultiAccountManager:
     """多账号管理器 - 简化配置版本"""
@@ -453,6 +1252,7 @@ class MultiAccountManager:
         self.telegram_bot_token = os.getenv('TG_BOT_TOKEN', '')
         self.telegram_chat_id = os.getenv('TG_CHAT_ID', '')
         self.accounts = self.load_accounts()
+        self.profiles = []  # 与 results 一一对应的各账号阶段统计
     
     def load_accounts(self):
         accounts = []
@@ -515,8 +1315,24 @@ class MultiAccountManager:
         
         raise ValueError("⚠️ 未找到有效的账号配置")
     
-    def send_notification(self, results):
-        """发送汇总通知到Telegram"""
+    def report_profile(self, report):
+        """输出分阶段耗时：日志中打印表格，LEAFLOW_PROFILE_JSON 指定时写入 JSON 文件；返回需附加到通知中的表格"""
+        table = format_profile_table(report)
+        logger.info("⏱ 分阶段耗时统计:\n" + table)
+        
+        json_path = os.getenv('LEAFLOW_PROFILE_JSON', '')
+        if json_path:
+            try:
+                with open(json_path, 'w', encoding='utf-8') as f:
+                    json.dump(report, f, ensure_ascii=False, indent=2)
+                logger.info(f"⏱ 耗时统计已写入 {json_path}")
+            except OSError as e:
+                logger.warning(f"⚠️ 写入耗时统计失败: {e}")
+        
+        return table if os.getenv('LEAFLOW_PROFILE_TG', '0') == '1' else None
+    
+    def send_notification(self, results, profile_table=None):
+        """发送汇总通知到Telegram，profile_table 不为空时在末尾附加分阶段耗时表格"""
         if not self.telegram_bot_token or not self.telegram_chat_id:
             logger.info("⚠️ Telegram配置未设置，跳过通知")
             return
@@ -552,6 +1368,10 @@ class MultiAccountManager:
                 if index < total_count - 1:
                     message += f"-------------------------------\n"
             
+            if profile_table:
+                message += f"=========================\n"
+                message += f"⏱ <strong>分阶段耗时</strong>\n<pre>{escape(profile_table)}</pre>\n"
+            
             url = f"https://api.telegram.org/bot{self.telegram_bot_token}/sendMessage"
             data = {
                 "chat_id": self.telegram_chat_id,
@@ -568,19 +1388,19 @@ class MultiAccountManager:
         except Exception as e:
             logger.error(f"❌ Telegram 通知发送出错: {e}")
     
-    def run_all(self):
-        """运行所有账号的签到流程"""
-        logger.info(f"👉 开始执行 {len(self.accounts)} 个账号的签到任务")
-        
+    def run_serial(self, driver_manager, rate_limiter):
+        """逐个处理账号"""
         results = []
         
         for i, account in enumerate(self.accounts, 1):
             logger.info(f"👉 处理第 {i}/{len(self.accounts)} 个账号")
             
+            auto_checkin = None
             try:
-                auto_checkin = LeaflowAutoCheckin(account['email'], account['password'])
+                auto_checkin = LeaflowAutoCheckin(account['email'], account['password'], driver_manager, rate_limiter)
                 success, result, balance = auto_checkin.run()
                 results.append((account['email'], success, result, balance))
+                self.profiles.append(auto_checkin.profiler.to_dict())
                 
                 # 在账号之间添加间隔，避免请求过于频繁
                 if i < len(self.accounts):
@@ -592,9 +1412,73 @@ class MultiAccountManager:
                 error_msg = f"❌ 处理账号时发生异常: {str(e)}"
                 logger.error(error_msg)
                 results.append((account['email'], False, error_msg, "未知"))
+                self.profiles.append(auto_checkin.profiler.to_dict() if auto_checkin else {})
+        
+        return results
+    
+    def run_parallel(self, workers, rate_limiter, reuse_browser, stagger):
+        """进程池并发处理账号，每个进程一个无头 Chrome，结果按账号配置顺序返回"""
+        logger.info(f"🚀 并发模式: {workers} 个进程，启动间隔 {stagger} 秒")
+        
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_checkin_worker,
+            initargs=(rate_limiter, reuse_browser),
+        ) as executor:
+            futures = [
+                executor.submit(
+                    _checkin_worker, i, account['email'], account['password'],
+                    i * stagger if i < workers else 0
+                )
+                for i, account in enumerate(self.accounts)
+            ]
+            
+            results = []
+            for account, future in zip(self.accounts, futures):
+                try:
+                    result, profile = future.result()
+                    results.append(result)
+                    self.profiles.append(profile)
+                except Exception as e:
+                    # 工作进程异常退出等情况
+                    error_msg = f"❌ 处理账号时发生异常: {str(e)}"
+                    logger.error(error_msg)
+                    results.append((account['email'], False, error_msg, "未知"))
+                    self.profiles.append({})
+        
+        return results
+    
+    def run_all(self):
+        """运行所有账号的签到流程"""
+        logger.info(f"👉 开始执行 {len(self.accounts)} 个账号的签到任务")
+        
+        # 默认所有账号共用一个浏览器，LEAFLOW_REUSE_BROWSER=0 时恢复为每个账号单独启动
+        reuse_browser = os.getenv('LEAFLOW_REUSE_BROWSER', '1') != '0'
+        # 并发进程数，大于 1 时使用进程池并发签到
+        concurrency = min(int(os.getenv('LEAFLOW_CONCURRENCY', '1')), len(self.accounts))
+        # 所有进程共享的页面请求限速，单位：页面/秒，0 表示不限速
+        rate_limiter = SharedRateLimiter(float(os.getenv('LEAFLOW_RATE_LIMIT', '1')))
+        # 并发模式下各进程首个账号的启动间隔，单位：秒
+        stagger = float(os.getenv('LEAFLOW_STAGGER', '3'))
+        
+        started = time.perf_counter()
+        self.profiles = []
+        if concurrency > 1:
+            results = self.run_parallel(concurrency, rate_limiter, reuse_browser, stagger)
+        else:
+            driver_manager = DriverManager() if reuse_browser else None
+            try:
+                results = self.run_serial(driver_manager, rate_limiter)
+            finally:
+                if driver_manager:
+                    driver_manager.close()
+        
+        # 分阶段耗时统计
+        report = build_profile_report([email for email, _, _, _ in results], self.profiles, time.perf_counter() - started)
+        profile_table = self.report_profile(report)
         
         # 发送汇总通知
-        self.send_notification(results)
+        self.send_notification(results, profile_table)
         
         # 返回总体结果
         success_count = sum(1 for _, success, _, _ in results if success)
@@ -1,8 +1,17 @@
 import os
+import re
 import time
+import random
+import json
+import asyncio
 import requests
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit, urljoin
+from html.parser import HTMLParser
+from collections import Counter, namedtuple
 from datetime import datetime, timedelta
-from playwright.sync_api import sync_playwright
+from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import async_playwright
 
 # -------------------------------
 log_buffer = []
@@ -10,9 +19,75 @@ log_buffer = []
 def log(msg):
     print(msg)
     log_buffer.append(msg)
+
+class AccountLog:
+    """单个账号的日志缓冲：并发执行时各账号日志先分别收集，结束后按账号顺序整体写入 log_buffer"""
+    def __init__(self):
+        self.lines = []
+
+    def __call__(self, msg):
+        print(msg)
+        self.lines.append(msg)
+
+    def flush(self):
+        log_buffer.extend(self.lines)
+        self.lines = []
 # -------------------------------
 
-# Telegram 推送函数
+# Telegram 推送
+TG_MAX_LEN = 4096      # 单条消息上限，按 UTF-16 码元计
+TG_MAX_ATTEMPTS = 5    # 单条消息最多尝试次数（含 429 限流后的重试）
+
+def _tg_len(text):
+    return len(text.encode("utf-16-le")) // 2
+
+def iter_tg_chunks(lines, limit=TG_MAX_LEN):
+    """按整行打包日志，每条消息不超过 limit；只有单行本身超长时才在行内按字符切分"""
+    buf, size = [], 0
+    for line in lines:
+        while _tg_len(line) > limit:
+            # 逐字符累计长度，保证不会把代理对/多字节字符切开
+            cut, used = 0, 0
+            for ch in line:
+                used += _tg_len(ch)
+                if used > limit:
+                    break
+                cut += 1
+            if buf:
+                yield "\n".join(buf)
+                buf, size = [], 0
+            yield line[:cut]
+            line = line[cut:]
+        extra = _tg_len(line) + (1 if buf else 0)
+        if buf and size + extra > limit:
+            yield "\n".join(buf)
+            buf, size, extra = [], 0, _tg_len(line)
+        buf.append(line)
+        size += extra
+    if buf:
+        yield "\n".join(buf)
+
+def post_tg_message(session, token, chat_id, text):
+    """发送一条消息，遇到 429 按 retry_after 等待后重试；返回 (是否成功, 说明)"""
+    for attempt in range(1, TG_MAX_ATTEMPTS + 1):
+        resp = session.post(
+            f"https://api.telegram.org/bot{token}/sendMessage",
+            json={"chat_id": chat_id, "text": text},
+            timeout=10
+        )
+        if resp.status_code == 200:
+            return True, None
+        if resp.status_code == 429 and attempt < TG_MAX_ATTEMPTS:
+            try:
+                retry_after = resp.json().get("parameters", {}).get("retry_after", 1)
+            except ValueError:
+                retry_after = int(resp.headers.get("Retry-After", 1))
+            print(f"⏳ Telegram 限流，{retry_after} 秒后重试")
+            time.sleep(retry_after)
+            continue
+        return False, f"HTTP {resp.status_code}, 响应: {resp.text}"
+    return False, "超过最大重试次数"
+
 def send_tg_log():
     token = os.getenv("TG_BOT_TOKEN")
     chat_id = os.getenv("TG_CHAT_ID")
@@ -24,22 +99,21 @@ def send_tg_log():
     beijing_now = utc_now + timedelta(hours=8)
     now_str = beijing_now.strftime("%Y-%m-%d %H:%M:%S") + " UTC+8"
 
-    final_msg = f"📌 Netlib 保活执行日志\n🕒 {now_str}\n\n" + "\n".join(log_buffer)
+    lines = [f"📌 Netlib 保活执行日志", f"🕒 {now_str}", ""]
+    for entry in log_buffer:
+        lines.extend(str(entry).split("\n"))
 
-    for i in range(0, len(final_msg), 3900):
-        chunk = final_msg[i:i+3900]
-        try:
-            resp = requests.get(
-                f"https://api.telegram.org/bot{token}/sendMessage",
-                params={"chat_id": chat_id, "text": chunk},
-                timeout=10
-            )
-            if resp.status_code == 200:
-                print(f"✅ Telegram 推送成功 [{i//3900 + 1}]")
-            else:
-                print(f"⚠️ Telegram 推送失败 [{i//3900 + 1}]: HTTP {resp.status_code}, 响应: {resp.text}")
-        except Exception as e:
-            print(f"⚠️ Telegram 推送异常 [{i//3900 + 1}]: {e}")
+    # 所有分段复用同一个 keep-alive 连接
+    with requests.Session() as session:
+        for index, chunk in enumerate(iter_tg_chunks(lines), 1):
+            try:
+                ok, detail = post_tg_message(session, token, chat_id, chunk)
+                if ok:
+                    print(f"✅ Telegram 推送成功 [{index}]")
+                else:
+                    print(f"⚠️ Telegram 推送失败 [{index}]: {detail}")
+            except Exception as e:
+                print(f"⚠️ Telegram 推送异常 [{index}]: {e}")
 
 # 从环境变量解析多个账号, 格式为多行，每行: username:password
 accounts_env = os.environ.get("NETLIB_ACCOUNTS", "")
@@ -56,67 +130,592 @@ for item in accounts_env.strip().split('\n'):
         except ValueError:
             log(f"⚠️ 忽略格式错误的账号项: {item} (预期格式: username:password)")
 
-fail_msgs = [
-    "Invalid credentials.",
-    "Not connected to server.",
-    "Error with the login: login size should be between 2 and 50 (currently: 1)"
-]
+# 等待策略: fast 只等待页面条件满足；human 在每步之间额外加入随机停顿，模拟真人操作节奏
+WAIT_MODE = os.environ.get("NETLIB_WAIT_MODE", "fast")
+WAIT_TIMEOUT = int(os.environ.get("NETLIB_WAIT_TIMEOUT", "30000"))  # 单个条件的最长等待时间，单位：毫秒
+CONCURRENCY = int(os.environ.get("NETLIB_CONCURRENCY", "1"))  # 同时登录的账号数，大于 1 时使用 async_playwright 并发模式
+# Validate 登录请求的 URL 路径（正则）：点击后只等待该请求的响应，不被统计上报等其他 POST 提前放行
+VALIDATE_PATH_RE = re.compile(os.environ.get("NETLIB_VALIDATE_PATH", r"^/login\b"))
+
+# HTTP 快速登录: auto（默认）先用纯 HTTP 提交登录表单，遇到 JS 验证等情况再改用浏览器；
+# off 始终使用浏览器；only 从不启动浏览器，HTTP 未完成的账号直接记为失败
+HTTP_MODE = os.environ.get("NETLIB_HTTP_MODE", "auto")
+
+# 轻量页面配置: 拦截图片、媒体、字体和统计脚本，减少带宽与加载时间
+LIGHT_PROFILE = os.environ.get("NETLIB_LIGHT_PROFILE", "1") != "0"
+BLOCK_RESOURCE_TYPES = {t.strip() for t in os.environ.get("NETLIB_BLOCK_RESOURCES", "image,media,font").split(",") if t.strip()}
+BLOCK_HOSTS = [
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "googlesyndication.com",
+    "hotjar.com", "clarity.ms", "facebook.net", "cloudflareinsights.com", "plausible.io",
+] + [h.strip() for h in os.environ.get("NETLIB_BLOCK_HOSTS", "").split(",") if h.strip()]
+# 按站点配置的放行列表（JSON），键为站点主机名，"*" 对所有站点生效，值为 URL 片段列表
+# 例: {"www.netlib.re": ["/static/logo.png"], "*": ["fonts.gstatic.com"]}
+ALLOW_LIST = json.loads(os.environ.get("NETLIB_ALLOW_LIST", "") or "{}")
+
+success_text = "You are the exclusive owner of the following domains."
+
+# 已知失败消息 -> 原因代码，可通过 NETLIB_FAIL_SIGNATURES（JSON）追加或覆盖，无需改代码
+# 例: {"Account suspended": "account_suspended"}
+FAIL_SIGNATURES = {
+    "Invalid credentials.": "invalid_credentials",
+    "Not connected to server.": "server_unavailable",
+    "Error with the login: login size should be between 2 and 50": "invalid_login_size",
+}
+FAIL_SIGNATURES.update(json.loads(os.environ.get("NETLIB_FAIL_SIGNATURES", "") or "{}"))
+
+fail_msgs = list(FAIL_SIGNATURES)
+
+FailureReason = namedtuple("FailureReason", ["code", "message"])
+
+class FailureClassifier:
+    """
+    登录失败分类：页面正文只取一次，用一个预编译的交替正则同时匹配全部失败签名，
+    返回 FailureReason(原因代码, 匹配到的消息)；未匹配到任何签名时原因代码为 "unknown"。
+    """
+    def __init__(self, signatures):
+        self.signatures = dict(signatures)
+        # 长签名优先，避免被作为其前缀的短签名抢先匹配
+        ordered = sorted(self.signatures, key=len, reverse=True)
+        self.pattern = re.compile("|".join(map(re.escape, ordered))) if ordered else None
+
+    def classify(self, body_text):
+        match = self.pattern.search(body_text) if self.pattern else None
+        if not match:
+            return FailureReason("unknown", None)
+        return FailureReason(self.signatures[match.group(0)], match.group(0))
+
+    def describe(self, USER, reason, url):
+        if reason.message:
+            return f"❌ 账号 {USER} 登录失败: {reason.message} [{reason.code}]"
+        return f"❌ 账号 {USER} 登录失败: 未知错误 (当前URL: {url}) [{reason.code}]"
+
+failure_classifier = FailureClassifier(FAIL_SIGNATURES)
+
+# -------------------------------
+# HTTP 快速登录：直接回放登录表单提交，无需启动浏览器
+LOGIN_URL = "https://www.netlib.re/"
+HTTP_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) "
+                  "Chrome/124.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+# JS 验证 / 需要脚本渲染的页面特征，命中后改用浏览器
+CHALLENGE_RE = re.compile(
+    r"cf-chl|challenge-platform|Just a moment\.\.\.|Checking your browser|enable JavaScript",
+    re.IGNORECASE,
+)
+CHALLENGE_STATUS = {403, 429, 503}
+
+class LoginFormParser(HTMLParser):
+    """从页面 HTML 中收集表单，找出包含密码框的登录表单"""
+    def __init__(self):
+        super().__init__()
+        self.forms = []
+        self._current = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {k: v or "" for k, v in attrs}
+        if tag == "form":
+            self._current = {"action": attrs.get("action", ""), "method": (attrs.get("method") or "get").lower(), "inputs": []}
+            self.forms.append(self._current)
+        elif tag in ("input", "button") and self._current is not None and attrs.get("name"):
+            self._current["inputs"].append(attrs)
+
+    def handle_endtag(self, tag):
+        if tag == "form":
+            self._current = None
+
+    def login_form(self):
+        for form in self.forms:
+            if any(field.get("type", "").lower() == "password" for field in form["inputs"]):
+                return form
+        return None
+
+def build_login_payload(form, USER, PWD):
+    """按表单字段构造提交数据：密码框填密码，首个用户名类输入框填用户名，其余字段保留原值"""
+    payload = {}
+    user_filled = False
+    text_fields = [f for f in form["inputs"] if f.get("type", "text").lower() in ("text", "email", "")]
+    # 优先选择名称像用户名的输入框
+    text_fields.sort(key=lambda f: not re.search(r"user|login|email|name", f["name"], re.IGNORECASE))
+    user_field = text_fields[0]["name"] if text_fields else None
+
+    for field in form["inputs"]:
+        name = field["name"]
+        kind = field.get("type", "text").lower()
+        if kind == "password":
+            payload[name] = PWD
+        elif name == user_field and not user_filled:
+            payload[name] = USER
+            user_filled = True
+        elif kind in ("checkbox", "radio"):
+            if "checked" in field:
+                payload[name] = field.get("value", "on")
+        elif kind not in ("submit", "button", "image", "reset") or field.get("value"):
+            payload.setdefault(name, field.get("value", ""))
+    return payload if user_filled else None
+
+def build_http_session():
+    """所有账号共用一个连接池，账号之间只清空 Cookie"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(HTTP_HEADERS)
+    return session
+
+def http_login(session, USER, PWD):
+    """
+    纯 HTTP 登录。返回 (状态, 说明)：
+    success 登录成功；failed 命中已知失败签名（说明为 FailureReason）；fallback 需要改用浏览器（说明为原因）
+    """
+    timeout = WAIT_TIMEOUT / 1000
+    session.cookies.clear()
+
+    resp = session.get(LOGIN_URL, timeout=timeout)
+    if resp.status_code in CHALLENGE_STATUS or CHALLENGE_RE.search(resp.text):
+        return "fallback", f"JS 验证 (HTTP {resp.status_code})"
+
+    parser = LoginFormParser()
+    parser.feed(resp.text)
+    form = parser.login_form()
+    if form is None:
+        return "fallback", "页面未提供静态登录表单"
+    payload = build_login_payload(form, USER, PWD)
+    if payload is None:
+        return "fallback", "未识别用户名输入框"
+
+    action = urljoin(resp.url, form["action"] or resp.url)
+    if form["method"] == "post":
+        resp = session.post(action, data=payload, headers={"Referer": resp.url}, timeout=timeout)
+    else:
+        resp = session.get(action, params=payload, headers={"Referer": resp.url}, timeout=timeout)
+
+    if success_text in resp.text:
+        return "success", None
+    if resp.status_code in CHALLENGE_STATUS or CHALLENGE_RE.search(resp.text):
+        return "fallback", f"JS 验证 (HTTP {resp.status_code})"
+    reason = failure_classifier.classify(resp.text)
+    if reason.code != "unknown":
+        return "failed", reason
+    return "fallback", f"登录结果无法识别 (HTTP {resp.status_code})"
+
+def run_http(targets):
+    """依次用 HTTP 登录各账号，返回需要改用浏览器登录的账号"""
+    pending = []
+    wait = WaitStrategy()
+    with build_http_session() as session:
+        for index, acc in enumerate(targets):
+            USER = acc["username"]
+            if index:
+                wait.pause("between_accounts")
+            try:
+                status, detail = http_login(session, USER, acc["password"])
+            except requests.RequestException as e:
+                status, detail = "fallback", f"请求异常: {e}"
+
+            if status == "success":
+                log(f"✅ 账号 {USER} 登录成功 (HTTP)")
+            elif status == "failed":
+                log(failure_classifier.describe(USER, detail, LOGIN_URL) + " (HTTP)")
+            else:
+                log(f"↪️ 账号 {USER} HTTP 登录未完成: {detail}")
+                pending.append(acc)
+    return pending
+
+def is_validate_response(response):
+    """判断响应是否来自 Validate 按钮提交的登录请求：发往登录站点的 POST，且路径匹配 NETLIB_VALIDATE_PATH"""
+    url = urlsplit(response.url)
+    return (response.request.method == "POST"
+            and url.hostname == urlsplit(LOGIN_URL).hostname
+            and VALIDATE_PATH_RE.search(url.path) is not None)
+
+class WaitStrategy:
+    """
+    等待策略层：用具体条件（元素可见、导航提交、Validate 请求返回）代替固定 sleep，
+    账号处理速度只取决于站点响应速度。human 模式下在步骤之间额外加入随机停顿。
+    """
+    HUMAN_DELAYS = {
+        "after_load": (2.0, 5.0),
+        "action": (0.8, 2.5),
+        "after_login": (2.0, 5.0),
+        "between_accounts": (1.0, 3.0),
+    }
+
+    def __init__(self, mode=WAIT_MODE, timeout=WAIT_TIMEOUT):
+        self.human = mode == "human"
+        self.timeout = timeout
+
+    def pause(self, kind):
+        if self.human:
+            time.sleep(random.uniform(*self.HUMAN_DELAYS[kind]))
+
+    def goto(self, page, url):
+        """导航提交（收到响应）即返回，后续由元素可见条件把关"""
+        page.goto(url, wait_until="commit", timeout=self.timeout)
+        self.pause("after_load")
+
+    def visible(self, locator):
+        locator.wait_for(state="visible", timeout=self.timeout)
+        return locator
+
+    def click_and_wait_response(self, page, locator, predicate):
+        """点击并等待满足 predicate 的网络响应，返回该响应"""
+        with page.expect_response(predicate, timeout=self.timeout) as response_info:
+            locator.click()
+        return response_info.value
+
+    def any_visible(self, locator):
+        """等待候选元素中任意一个出现，超时返回 False"""
+        try:
+            locator.first.wait_for(state="visible", timeout=self.timeout)
+            return True
+        except PlaywrightTimeoutError:
+            return False
+
+class ResourceProfile:
+    """请求拦截规则：放行列表优先，其次按资源类型和统计脚本主机拦截"""
+    def __init__(self, site, block_types=BLOCK_RESOURCE_TYPES, block_hosts=BLOCK_HOSTS, allow_list=ALLOW_LIST):
+        self.block_types = block_types
+        self.block_hosts = block_hosts
+        self.allow = list(allow_list.get("*", [])) + list(allow_list.get(site, []))
+
+    def block_reason(self, request):
+        """返回拦截原因（资源类型，或命中拦截主机时为 "hosts"），不拦截时返回 None"""
+        url = request.url
+        if any(pattern in url for pattern in self.allow):
+            return None
+        if request.resource_type in self.block_types:
+            return request.resource_type
+        host = urlsplit(url).hostname or ""
+        if any(host == h or host.endswith("." + h) for h in self.block_hosts):
+            return "hosts"
+        return None
+
+class TrafficStats:
+    """
+    单个账号的流量统计：按原因计数的被拦截请求与已完成请求（结束时汇总传输字节数）。
+    被拦截的请求在发出前即中止，无从得知其大小，因此只报告实际传输量与耗时，不估算节省量。
+    """
+    BLOCK_LABELS = {"hosts": "拦截主机"}
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.blocked = Counter()
+        self.finished = []
+
+    def block(self, reason):
+        self.blocked[reason] += 1
+
+    def summary(self, transferred):
+        elapsed = time.monotonic() - self.started
+        detail = "、".join(f"{self.BLOCK_LABELS.get(reason, reason)} {count}"
+                          for reason, count in self.blocked.most_common())
+        blocked = f"拦截 {sum(self.blocked.values())} 个请求" + (f"（{detail}）" if detail else "")
+        return (f"📉 传输 {transferred / 1024:.1f} KB（{len(self.finished)} 个请求），"
+                f"{blocked}，耗时 {elapsed:.1f} 秒")
+
+def _request_bytes(sizes):
+    return sum(max(sizes.get(key, 0), 0) for key in
+               ("requestHeadersSize", "requestBodySize", "responseHeadersSize", "responseBodySize"))
 
-def login_account(playwright, USER, PWD):
+def attach_light_profile(context, site):
+    """为上下文安装拦截规则并开始统计，未启用轻量配置时返回 None"""
+    if not LIGHT_PROFILE:
+        return None
+    profile = ResourceProfile(site)
+    stats = TrafficStats()
+
+    def handle(route):
+        reason = profile.block_reason(route.request)
+        if reason:
+            stats.block(reason)
+            route.abort()
+        else:
+            route.continue_()
+
+    context.route("**/*", handle)
+    context.on("requestfinished", stats.finished.append)
+    return stats
+
+def report_traffic(stats):
+    return stats.summary(sum(_request_bytes(request.sizes()) for request in stats.finished))
+
+class BrowserManager:
+    """
+    整个运行期间复用同一个 Chromium 进程，每个账号使用独立的 BrowserContext（Cookie/存储互不影响）。
+    仅在浏览器崩溃或断开连接时重新启动。
+    """
+    def __init__(self, playwright, headless=True):
+        self.playwright = playwright
+        self.headless = headless
+        self.browser = None
+
+    def get(self):
+        if self.browser is None or not self.browser.is_connected():
+            if self.browser is not None:
+                log("⚠️ 浏览器已断开，正在重新启动...")
+            # 使用 headless=True (无头模式)
+            self.browser = self.playwright.chromium.launch(headless=self.headless)
+        return self.browser
+
+    def is_alive(self):
+        return self.browser is not None and self.browser.is_connected()
+
+    def close(self):
+        if self.is_alive():
+            self.browser.close()
+        self.browser = None
+
+def login_account(browser_manager, USER, PWD, wait=None, retry_on_crash=True):
     log(f"🚀 开始登录账号: {USER}")
+    wait = wait or WaitStrategy()
+    context = None
+    stats = None
     try:
-        # 使用 headless=True (无头模式)
-        browser = playwright.chromium.launch(headless=True)
-        context = browser.new_context()
+        context = browser_manager.get().new_context()
+        stats = attach_light_profile(context, "www.netlib.re")
         page = context.new_page()
 
-        page.goto("https://www.netlib.re/")
-        time.sleep(5)
+        wait.goto(page, "https://www.netlib.re/")
 
-        page.get_by_text("Login").click()
-        time.sleep(2)
-        page.get_by_role("textbox", name="Username").fill(USER)
-        time.sleep(2)
-        page.get_by_role("textbox", name="Password").fill(PWD)
-        time.sleep(2)
-        page.get_by_role("button", name="Validate").click()
-        page.wait_for_load_state("networkidle")
-        time.sleep(2)
+        wait.visible(page.get_by_text("Login")).click()
+        wait.pause("action")
+        wait.visible(page.get_by_role("textbox", name="Username")).fill(USER)
+        wait.pause("action")
+        wait.visible(page.get_by_role("textbox", name="Password")).fill(PWD)
+        wait.pause("action")
+        try:
+            wait.click_and_wait_response(
+                page, page.get_by_role("button", name="Validate"),
+                is_validate_response,
+            )
+        except PlaywrightTimeoutError:
+            log(f"⚠️ 账号 {USER} 未捕获到 Validate 请求的响应，继续检查页面")
+
+        # 等待成功提示或任一已知失败消息出现
+        outcome = page.get_by_text(success_text)
+        for msg in fail_msgs:
+            outcome = outcome.or_(page.get_by_text(msg))
+        wait.any_visible(outcome)
 
         # 检查是否登录成功
-        success_text = "You are the exclusive owner of the following domains."
         if page.query_selector(f"text={success_text}"):
             log(f"✅ 账号 {USER} 登录成功")
-            time.sleep(5)
+            wait.pause("after_login")
         else:
-            # 检查是否有预设的失败消息
-            failed_msg = None
-            for msg in fail_msgs:
-                # 使用 page.inner_text() 或其他方式检查页面内容
-                if page.locator("body").inner_text().find(msg) != -1:
-                    failed_msg = msg
-                    break
-            
-            if failed_msg:
-                log(f"❌ 账号 {USER} 登录失败: {failed_msg}")
-            else:
-                log(f"❌ 账号 {USER} 登录失败: 未知错误 (当前URL: {page.url})")
-
-        context.close()
-        browser.close()
+            # 正文只取一次，一次匹配全部已知失败消息
+            reason = failure_classifier.classify(page.locator("body").inner_text())
+            log(failure_classifier.describe(USER, reason, page.url))
 
     except Exception as e:
+        if retry_on_crash and not browser_manager.is_alive():
+            # 浏览器进程在本账号处理过程中崩溃，重启后重试一次
+            log(f"⚠️ 账号 {USER} 处理过程中浏览器崩溃: {e}")
+            return login_account(browser_manager, USER, PWD, wait, retry_on_crash=False)
         log(f"❌ 账号 {USER} 登录异常: {e}")
 
+    finally:
+        if context is not None and browser_manager.is_alive():
+            try:
+                if stats:
+                    log(f"   {report_traffic(stats)}")
+            except Exception as e:
+                log(f"⚠️ 流量统计失败: {e}")
+            try:
+                context.close()
+            except Exception:
+                pass
+
+class AsyncWaitStrategy(WaitStrategy):
+    """WaitStrategy 的 async_playwright 版本"""
+
+    async def pause(self, kind):
+        if self.human:
+            await asyncio.sleep(random.uniform(*self.HUMAN_DELAYS[kind]))
+
+    async def goto(self, page, url):
+        await page.goto(url, wait_until="commit", timeout=self.timeout)
+        await self.pause("after_load")
+
+    async def visible(self, locator):
+        await locator.wait_for(state="visible", timeout=self.timeout)
+        return locator
+
+    async def click_and_wait_response(self, page, locator, predicate):
+        async with page.expect_response(predicate, timeout=self.timeout) as response_info:
+            await locator.click()
+        return await response_info.value
+
+    async def any_visible(self, locator):
+        try:
+            await locator.first.wait_for(state="visible", timeout=self.timeout)
+            return True
+        except PlaywrightTimeoutError:
+            return False
+
+class AsyncBrowserManager:
+    """BrowserManager 的 async_playwright 版本，多个账号协程共用一个浏览器，重启过程加锁"""
+    def __init__(self, playwright, headless=True):
+        self.playwright = playwright
+        self.headless = headless
+        self.browser = None
+        self.lock = asyncio.Lock()
+
+    async def get(self):
+        async with self.lock:
+            if self.browser is None or not self.browser.is_connected():
+                if self.browser is not None:
+                    print("⚠️ 浏览器已断开，正在重新启动...")
+                self.browser = await self.playwright.chromium.launch(headless=self.headless)
+            return self.browser
+
+    def is_alive(self):
+        return self.browser is not None and self.browser.is_connected()
+
+    async def close(self):
+        if self.is_alive():
+            await self.browser.close()
+        self.browser = None
+
+async def attach_light_profile_async(context, site):
+    """attach_light_profile 的异步版本"""
+    if not LIGHT_PROFILE:
+        return None
+    profile = ResourceProfile(site)
+    stats = TrafficStats()
+
+    async def handle(route):
+        reason = profile.block_reason(route.request)
+        if reason:
+            stats.block(reason)
+            await route.abort()
+        else:
+            await route.continue_()
+
+    await context.route("**/*", handle)
+    context.on("requestfinished", stats.finished.append)
+    return stats
+
+async def report_traffic_async(stats):
+    sizes = await asyncio.gather(*(request.sizes() for request in stats.finished), return_exceptions=True)
+    return stats.summary(sum(_request_bytes(s) for s in sizes if isinstance(s, dict)))
+
+async def login_account_async(browser_manager, USER, PWD, wait, out, retry_on_crash=True):
+    """login_account 的异步版本，日志写入该账号自己的 AccountLog"""
+    out(f"🚀 开始登录账号: {USER}")
+    context = None
+    stats = None
+    try:
+        context = await (await browser_manager.get()).new_context()
+        stats = await attach_light_profile_async(context, "www.netlib.re")
+        page = await context.new_page()
+
+        await wait.goto(page, "https://www.netlib.re/")
+
+        await (await wait.visible(page.get_by_text("Login"))).click()
+        await wait.pause("action")
+        await (await wait.visible(page.get_by_role("textbox", name="Username"))).fill(USER)
+        await wait.pause("action")
+        await (await wait.visible(page.get_by_role("textbox", name="Password"))).fill(PWD)
+        await wait.pause("action")
+        try:
+            await wait.click_and_wait_response(
+                page, page.get_by_role("button", name="Validate"),
+                is_validate_response,
+            )
+        except PlaywrightTimeoutError:
+            out(f"⚠️ 账号 {USER} 未捕获到 Validate 请求的响应，继续检查页面")
+
+        outcome = page.get_by_text(success_text)
+        for msg in fail_msgs:
+            outcome = outcome.or_(page.get_by_text(msg))
+        await wait.any_visible(outcome)
+
+        if await page.query_selector(f"text={success_text}"):
+            out(f"✅ 账号 {USER} 登录成功")
+            await wait.pause("after_login")
+        else:
+            reason = failure_classifier.classify(await page.locator("body").inner_text())
+            out(failure_classifier.describe(USER, reason, page.url))
+
+    except Exception as e:
+        if retry_on_crash and not browser_manager.is_alive():
+            out(f"⚠️ 账号 {USER} 处理过程中浏览器崩溃: {e}")
+            return await login_account_async(browser_manager, USER, PWD, wait, out, retry_on_crash=False)
+        out(f"❌ 账号 {USER} 登录异常: {e}")
+
+    finally:
+        if context is not None and browser_manager.is_alive():
+            try:
+                if stats:
+                    out(f"   {await report_traffic_async(stats)}")
+            except Exception as e:
+                out(f"⚠️ 流量统计失败: {e}")
+            try:
+                await context.close()
+            except Exception:
+                pass
+
+async def run_async(concurrency, targets):
+    """并发模式：一个浏览器、每账号一个上下文，信号量限制同时进行的登录数"""
+    outs = [AccountLog() for _ in targets]
+    semaphore = asyncio.Semaphore(concurrency)
+    wait = AsyncWaitStrategy()
+
+    async def worker(index, acc):
+        async with semaphore:
+            if index >= concurrency:
+                await wait.pause("between_accounts")
+            await login_account_async(browser_manager, acc["username"], acc["password"], wait, outs[index])
+
+    async with async_playwright() as playwright:
+        browser_manager = AsyncBrowserManager(playwright)
+        try:
+            # return_exceptions=True: 单个账号的意外错误不影响其他账号
+            results = await asyncio.gather(
+                *(worker(index, acc) for index, acc in enumerate(targets)), return_exceptions=True
+            )
+            for out, acc, result in zip(outs, targets, results):
+                if isinstance(result, BaseException):
+                    out(f"❌ 账号 {acc['username']} 登录异常: {result}")
+        finally:
+            await browser_manager.close()
+            for out in outs:
+                out.flush()
+
 def run():
     if not accounts:
         log("⚠️ 未找到任何账号配置，请检查 NETLIB_ACCOUNTS 环境变量。")
         return
 
+    # 先走 HTTP 快速登录，只有未完成的账号才启动浏览器
+    targets = accounts
+    if HTTP_MODE != "off":
+        targets = run_http(accounts)
+        if not targets:
+            return
+        if HTTP_MODE == "only":
+            for acc in targets:
+                log(f"❌ 账号 {acc['username']} HTTP 登录未完成，NETLIB_HTTP_MODE=only 不启动浏览器")
+            return
+        log(f"🌐 {len(targets)} 个账号改用浏览器登录")
+
+    if CONCURRENCY > 1:
+        asyncio.run(run_async(CONCURRENCY, targets))
+        return
+
     with sync_playwright() as playwright:
-        for acc in accounts:
-            login_account(playwright, acc["username"], acc["password"])
-            time.sleep(2)
+        browser_manager = BrowserManager(playwright)
+        wait = WaitStrategy()
+        try:
+            for index, acc in enumerate(targets):
+                if index:
+                    wait.pause("between_accounts")
+                login_account(browser_manager, acc["username"], acc["password"], wait)
+        finally:
+            browser_manager.close()
 
 if __name__ == "__main__":
     run()
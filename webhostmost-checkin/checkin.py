@@ -1,8 +1,39 @@
 import requests
+from requests.adapters import HTTPAdapter
+from requests.cookies import create_cookie
 import os
 import sys
-import re
+import json
+import time
+import asyncio
+import base64
+import hashlib
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
 from datetime import datetime, timedelta
+from page_parser import scan_response, scan_response_async
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+except ImportError:  # 未安装 cryptography 时禁用 Cookie 持久化
+    Fernet = None
+
+try:
+    import httpx
+except ImportError:  # 未安装 httpx 时只能使用同步引擎
+    httpx = None
+
+try:
+    import h2  # noqa: F401  httpx 启用 HTTP/2 所需
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 
 # -----------------------------------------------------------------------
 BASE_URL = "https://client.webhostmost.com"
@@ -12,46 +43,292 @@ EMAIL_FIELD = "username"
 PASSWORD_FIELD = "password"
 TG_BOT_TOKEN = os.getenv("TG_BOT_TOKEN")
 TG_CHAT_ID = os.getenv("TG_CHAT_ID")
+WHM_ACCOUNT_FILE = os.getenv("WHM_ACCOUNT_FILE")  # 账号文件路径，"-" 表示标准输入；设置后优先于 WHM_ACCOUNT
+WHM_CONCURRENCY = int(os.getenv("WHM_CONCURRENCY", "5"))  # 同时登录的账号数，设为 1 即逐个登录
+WHM_RATE_LIMIT = float(os.getenv("WHM_RATE_LIMIT", "5"))  # 每个主机的请求速率上限（请求/秒）
+WHM_COOKIE_KEY = os.getenv("WHM_COOKIE_KEY")  # Cookie 加密口令，设置后启用 Cookie 持久化
+WHM_COOKIE_DIR = os.getenv("WHM_COOKIE_DIR", ".whm_cookies")  # 加密 Cookie 文件的存放目录
+WHM_ENGINE = os.getenv("WHM_ENGINE", "sync")  # sync: requests 线程池；async: httpx 单事件循环（也可用 --async 参数）
 # -----------------------------------------------------------------------
 
 
-def parse_users(users_secret):
-    """解析 GitHub Secret 格式：邮箱:密码\\n邮箱2:密码2"""
-    users = []
-    if not users_secret:
-        print("❌ 未找到 WHM_ACCOUNT 环境变量中的用户数据。")
-        return users
+_account_lines = contextvars.ContextVar("account_lines", default=None)
+_print_lock = threading.Lock()
 
-    for line in users_secret.strip().split('\n'):
-        parts = line.strip().split(':', 1)
+
+def log(msg):
+    """输出日志；处于 account_log() 中时先缓冲，账号处理完毕后整段输出"""
+    lines = _account_lines.get()
+    if lines is None:
+        print(msg)
+    else:
+        lines.append(msg)
+
+
+@contextmanager
+def account_log():
+    """
+    为当前账号缓冲日志，结束时在锁内一次性打印，避免并发登录时各账号的输出交错。
+    基于 contextvars，线程池与 asyncio 任务中均按账号隔离。
+    """
+    lines = []
+    token = _account_lines.set(lines)
+    try:
+        yield
+    finally:
+        _account_lines.reset(token)
+        if lines:
+            with _print_lock:
+                print("\n".join(lines), flush=True)
+
+
+class WhmAccount:
+    """单个账号记录，使用 __slots__ 以便大量账号时保持内存占用稳定"""
+    __slots__ = ("email", "password", "line_no")
+
+    def __init__(self, email, password, line_no):
+        self.email = email
+        self.password = password
+        self.line_no = line_no
+
+
+def iter_text_lines(text):
+    """逐行遍历字符串，不一次性生成整个行列表"""
+    start = 0
+    while start < len(text):
+        end = text.find('\n', start)
+        if end == -1:
+            end = len(text)
+        yield text[start:end]
+        start = end + 1
+
+
+def iter_users(lines):
+    """惰性解析账号行（邮箱:密码），格式错误的行带行号提示后跳过"""
+    for line_no, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        parts = line.split(':', 1)
         if len(parts) == 2:
-            email, password = parts[0].strip(), parts[1].strip()
-            users.append({'email': email, 'password': password})
+            yield WhmAccount(parts[0].strip(), parts[1].strip(), line_no)
         else:
-            print(f"⚠️ 跳过格式错误的行: {line}")
-    return users
+            print(f"⚠️ 跳过第 {line_no} 行：格式错误，应为 邮箱:密码")
+
+
+def _iter_file_lines(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        yield from f
+
+
+def open_user_source():
+    """按配置返回账号行的来源：WHM_ACCOUNT_FILE 指定的文件或标准输入，否则为 WHM_ACCOUNT 环境变量"""
+    if WHM_ACCOUNT_FILE == "-":
+        return iter_users(sys.stdin)
+    if WHM_ACCOUNT_FILE:
+        return iter_users(_iter_file_lines(WHM_ACCOUNT_FILE))
+    return iter_users(iter_text_lines(os.getenv('WHM_ACCOUNT') or ""))
+
+
+class TokenBucket:
+    """线程安全的令牌桶，每秒补充 rate 个令牌，无令牌时 acquire() 阻塞等待"""
+
+    def __init__(self, rate, capacity):
+        self.rate = max(rate, 0.001)
+        self.capacity = max(capacity, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class HostRateLimiter:
+    """按主机名分别限速，client.webhostmost.com 与 api.telegram.org 互不影响"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, url):
+        host = urlsplit(url).hostname or ""
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = self.buckets[host] = TokenBucket(self.rate, self.capacity)
+        bucket.acquire()
+
+
+class RateLimitedSession(requests.Session):
+    """每次实际发出请求（含重定向）前先向主机限速器申请令牌"""
+
+    def __init__(self, limiter):
+        super().__init__()
+        self.limiter = limiter
+
+    def send(self, request, **kwargs):
+        self.limiter.acquire(request.url)
+        return super().send(request, **kwargs)
+
+
+class SessionPool:
+    """
+    登录会话池：所有会话挂载同一个 HTTPAdapter，共享到 client.webhostmost.com 的 keep-alive 连接；
+    每个账号借出时 Cookie 为空，归还时清空，账号之间互不串号。
+    """
+
+    def __init__(self, size, rate_limit):
+        self.adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max(size, 1))
+        self.limiter = HostRateLimiter(rate_limit, max(size, 1))
+        self.idle = deque()
+        self.lock = threading.Lock()
+
+    def _new_session(self):
+        session = RateLimitedSession(self.limiter)
+        session.mount("https://", self.adapter)
+        session.mount("http://", self.adapter)
+        return session
+
+    @contextmanager
+    def session(self):
+        with self.lock:
+            session = self.idle.pop() if self.idle else None
+        if session is None:
+            session = self._new_session()
+        try:
+            yield session
+        finally:
+            session.cookies.clear()
+            with self.lock:
+                self.idle.append(session)
+
+
+session_pool = SessionPool(WHM_CONCURRENCY, WHM_RATE_LIMIT)
+
+
+class CookieStore:
+    """
+    按账号保存登录 Cookie（含 rememberme），使用 Fernet 加密落盘。
+    文件名为邮箱的 SHA-256，目录中不出现明文邮箱或 Cookie。
+    加密密钥由口令经 PBKDF2-HMAC-SHA256 与随机盐派生，盐写在文件头部：
+    文件随 Actions artifact 公开下载时，弱口令也无法被快速离线穷举。
+    """
+    MAGIC = b"WHMC1"
+    SALT_SIZE = 16
+    KDF_ITERATIONS = 600_000
+
+    def __init__(self, directory, passphrase):
+        self.directory = directory
+        self.passphrase = passphrase.encode("utf-8")
+        self.salt = os.urandom(self.SALT_SIZE)  # 本次运行写入的文件共用一个盐，只需派生一次密钥
+        self._fernets = {}
+        self._kdf_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _fernet(self, salt):
+        """按盐派生并缓存 Fernet 实例；PBKDF2 计算较慢，同一个盐只算一次"""
+        with self._kdf_lock:
+            fernet = self._fernets.get(salt)
+            if fernet is None:
+                kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt, iterations=self.KDF_ITERATIONS)
+                fernet = Fernet(base64.urlsafe_b64encode(kdf.derive(self.passphrase)))
+                self._fernets[salt] = fernet
+            return fernet
+
+    def _path(self, email):
+        digest = hashlib.sha256(email.strip().lower().encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest}.bin")
+
+    def load(self, email, jar):
+        """把已保存的 Cookie 写入 jar（requests 的 session.cookies 或 httpx 的 client.cookies.jar），返回是否加载成功"""
+        path = self._path(email)
+        if not os.path.exists(path):
+            return False
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            header = len(self.MAGIC) + self.SALT_SIZE
+            if not data.startswith(self.MAGIC) or len(data) <= header:
+                raise ValueError("文件格式不正确")
+            cookies = json.loads(self._fernet(data[len(self.MAGIC):header]).decrypt(data[header:]))
+        except (OSError, ValueError, InvalidToken) as e:
+            log(f"⚠️ 读取已保存的 Cookie 失败，将重新登录: {e}")
+            return False
+
+        now = time.time()
+        for c in cookies:
+            if c.get("expires") and c["expires"] < now:
+                continue
+            jar.set_cookie(create_cookie(c["name"], c["value"], domain=c["domain"], path=c["path"],
+                                         expires=c.get("expires"), secure=c.get("secure", False)))
+        return len(jar) > 0
+
+    def save(self, email, jar):
+        cookies = [
+            {"name": c.name, "value": c.value, "domain": c.domain, "path": c.path,
+             "expires": c.expires, "secure": c.secure}
+            for c in jar
+        ]
+        path = self._path(email)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.MAGIC + self.salt + self._fernet(self.salt).encrypt(json.dumps(cookies).encode("utf-8")))
+        os.replace(tmp_path, path)
+
+    def discard(self, email):
+        try:
+            os.remove(self._path(email))
+        except FileNotFoundError:
+            pass
+
+
+def create_cookie_store():
+    if not WHM_COOKIE_KEY:
+        return None
+    if Fernet is None:
+        print("⚠️ 已设置 WHM_COOKIE_KEY 但未安装 cryptography，Cookie 持久化已禁用。")
+        return None
+    return CookieStore(WHM_COOKIE_DIR, WHM_COOKIE_KEY)
+
+
+cookie_store = create_cookie_store()
+
 
 def get_csrf_token(session):
     """从登录页提取 CSRF Token"""
     try:
-        r = session.get(LOGIN_URL, timeout=15)
+        r = session.get(LOGIN_URL, timeout=15, stream=True)
         r.raise_for_status()
-        match = re.search(r'name="token"\s+value="([^"]+)"', r.text)
-        if match:
-            token = match.group(1)
-            print(f"🔑 获取到 CSRF Token: {token[:8]}...")
+        token = scan_response(r, stop_on=("token",)).csrf_token
+        if token:
+            log(f"🔑 获取到 CSRF Token: {token[:8]}...")
             return token
         else:
-            print("⚠️ 未找到 CSRF Token，可能页面结构已变。")
+            log("⚠️ 未找到 CSRF Token，可能页面结构已变。")
             return None
     except requests.RequestException as e:
-        print(f"❌ 获取登录页时出错: {e}")
+        log(f"❌ 获取登录页时出错: {e}")
         return None
 
-def extract_remaining_days():
+def extract_remaining_days(scan=None):
     """
-    精确计算剩余天数（向下取整）
+    优先使用客户区页面上的剩余天数 / 到期时间；页面中未找到时按登录后 45 天估算（向下取整）
     """
+    if scan is not None and scan.remaining_days is not None:
+        return scan.remaining_days
+    log("⚠️ 页面中未找到剩余时间，按登录后 45 天估算。")
     TOTAL_DAYS = 45
     now = datetime.now()
     end_time = now + timedelta(days=TOTAL_DAYS)  # JS 逻辑: 登录时 + 45天
@@ -59,14 +336,52 @@ def extract_remaining_days():
     remaining_days = remaining_timedelta.days
     return remaining_days
 
-def attempt_login(email, password):
-    """尝试登录并返回结果与剩余时间"""
-    session = requests.Session()
-    print(f"\n👤 尝试登录用户：{email}")
+def try_saved_session(email, session):
+    """用已保存的 Cookie 直接访问客户区，仍处于登录状态则返回成功结果，否则返回 None"""
+    try:
+        response = session.get(REDIRECT_URL, allow_redirects=True, timeout=15, stream=True)
+        scan = scan_response(response, stop_on=("days",))
+    except requests.exceptions.RequestException as e:
+        log(f"⚠️ 使用已保存的 Cookie 访问客户区失败: {e}")
+        return None
+
+    # 会话失效时 WHMCS 会重定向回登录页
+    if REDIRECT_URL not in response.url or not (scan.found("logout") or scan.found("days")):
+        log("🔄 已保存的 Cookie 已失效，改用账号密码登录。")
+        return None
+
+    log(f"✅ 已通过保存的 Cookie 登录用户 {email}，正在解析剩余时间...")
+    cookie_store.save(email, session.cookies)
+    remaining_days = extract_remaining_days(scan)
+    if remaining_days is not None:
+        log(f"📆 剩余时间: {remaining_days} 天")
+    else:
+        log("⚠️ 无法获取剩余时间。")
+    return {"email": email, "success": True, "days": remaining_days}
+
+
+def attempt_login(email, password, session=None):
+    """尝试登录并返回结果与剩余时间，未传入 session 时从会话池借用"""
+    if session is None:
+        with session_pool.session() as pooled:
+            return attempt_login(email, password, pooled)
+    with account_log():
+        return _attempt_login(email, password, session)
+
+
+def _attempt_login(email, password, session):
+    log(f"\n👤 尝试登录用户：{email}")
+
+    if cookie_store and cookie_store.load(email, session.cookies):
+        result = try_saved_session(email, session)
+        if result:
+            return result
+        session.cookies.clear()
+        cookie_store.discard(email)
 
     token = get_csrf_token(session)
     if not token:
-        print("⚠️ 获取 CSRF Token 失败，跳过此账号。")
+        log("⚠️ 获取 CSRF Token 失败，跳过此账号。")
         return {"email": email, "success": False, "reason": "无法获取 CSRF Token"}
 
     payload = {
@@ -83,31 +398,35 @@ def attempt_login(email, password):
     }
 
     try:
-        response = session.post(LOGIN_URL, data=payload, headers=headers, allow_redirects=True, timeout=15)
-
-        if REDIRECT_URL in response.url or "clientarea.php" in response.text.lower():
-            print(f"✅ 成功登录用户 {email}，正在解析剩余时间...")
-            remaining_days = extract_remaining_days()
+        response = session.post(LOGIN_URL, data=payload, headers=headers, allow_redirects=True, timeout=15,
+                                stream=True)
+        scan = scan_response(response, stop_on=("days", "incorrect", "invalid_csrf"))
+
+        if REDIRECT_URL in response.url or scan.found("clientarea"):
+            log(f"✅ 成功登录用户 {email}，正在解析剩余时间...")
+            if cookie_store:
+                cookie_store.save(email, session.cookies)
+            remaining_days = extract_remaining_days(scan)
             if remaining_days is not None:
-                print(f"📆 剩余时间: {remaining_days} 天")
+                log(f"📆 剩余时间: {remaining_days} 天")
             else:
-                print("⚠️ 无法获取剩余时间。")
+                log("⚠️ 无法获取剩余时间。")
             return {"email": email, "success": True, "days": remaining_days}
 
-        elif "incorrect" in response.text.lower():
-            print(f"❌ 登录失败：账号或密码错误。用户 {email}")
+        elif scan.found("incorrect"):
+            log(f"❌ 登录失败：账号或密码错误。用户 {email}")
             return {"email": email, "success": False, "reason": "账号或密码错误"}
 
-        elif "Invalid CSRF token" in response.text:
-            print(f"❌ 登录失败：Token 无效。用户 {email}")
+        elif scan.found("invalid_csrf"):
+            log(f"❌ 登录失败：Token 无效。用户 {email}")
             return {"email": email, "success": False, "reason": "CSRF Token 无效"}
 
         else:
-            print(f"⚠️ 登录失败：未知原因。URL: {response.url}")
+            log(f"⚠️ 登录失败：未知原因。URL: {response.url}")
             return {"email": email, "success": False, "reason": "未知错误"}
 
     except requests.exceptions.RequestException as e:
-        print(f"❌ 登录用户 {email} 时发生错误: {e}")
+        log(f"❌ 登录用户 {email} 时发生错误: {e}")
         return {"email": email, "success": False, "reason": str(e)}
 
 
@@ -125,7 +444,8 @@ def send_tg_message(message):
     }
 
     try:
-        r = requests.post(url, data=data, timeout=10)
+        with session_pool.session() as session:
+            r = session.post(url, data=data, timeout=10)
         if r.status_code == 200:
             print("📨 Telegram 通知已发送。")
         else:
@@ -134,23 +454,249 @@ def send_tg_message(message):
         print(f"⚠️ Telegram 通知错误: {e}")
 
 
-def main():
-    user_credentials_secret = os.getenv('WHM_ACCOUNT')
+def run_logins(users, workers):
+    """
+    在线程池中并发登录，按账号原始顺序产出结果。
+    在途任务数限制为 workers 的两倍，账号边解析边提交。
+    """
+    workers = max(workers, 1)
+    window = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for user in users:
+            window.append(executor.submit(attempt_login, user.email, user.password))
+            if len(window) >= workers * 2:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+
+
+class AsyncTokenBucket:
+    """TokenBucket 的 asyncio 版本，等待令牌时让出事件循环"""
+
+    def __init__(self, rate, capacity):
+        self.rate = max(rate, 0.001)
+        self.capacity = max(capacity, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AsyncHostRateLimiter:
+    """HostRateLimiter 的 asyncio 版本"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.buckets = {}
+
+    async def acquire(self, url):
+        host = urlsplit(url).hostname or ""
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            bucket = self.buckets[host] = AsyncTokenBucket(self.rate, self.capacity)
+        await bucket.acquire()
+
+
+if httpx is not None:
+    class SharedAsyncTransport(httpx.AsyncBaseTransport):
+        """
+        多个 AsyncClient 共用的连接池：每个账号一个客户端（Cookie 相互隔离），
+        单个客户端关闭时不关闭底层连接池，全部完成后由 close_shared() 统一关闭。
+        """
+
+        def __init__(self, **kwargs):
+            self.inner = httpx.AsyncHTTPTransport(**kwargs)
+
+        async def handle_async_request(self, request):
+            return await self.inner.handle_async_request(request)
+
+        async def aclose(self):
+            pass
+
+        async def close_shared(self):
+            await self.inner.aclose()
+
+
+class AsyncLoginEngine:
+    """
+    基于 httpx 的异步登录引擎：CSRF 获取、登录 POST 与 Telegram 通知在同一个事件循环中完成，
+    服务端支持时使用 HTTP/2。attempt_login() 返回值与同步版本的结果字典一致。
+    """
 
-    if not user_credentials_secret:
-        print("错误：未设置 WHM_ACCOUNT 环境变量。请在 GitHub Secrets 中配置。")
-        sys.exit(1)
+    def __init__(self, concurrency, rate_limit):
+        concurrency = max(concurrency, 1)
+        self.concurrency = concurrency
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.limiter = AsyncHostRateLimiter(rate_limit, concurrency)
+        self.transport = SharedAsyncTransport(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        )
+
+    async def _throttle(self, request):
+        await self.limiter.acquire(str(request.url))
+
+    def new_client(self):
+        return httpx.AsyncClient(
+            transport=self.transport,
+            follow_redirects=True,
+            timeout=15,
+            headers={"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"},
+            event_hooks={"request": [self._throttle]},  # 每次实际请求（含重定向）前限速
+        )
+
+    async def get_csrf_token(self, client):
+        """从登录页提取 CSRF Token"""
+        try:
+            async with client.stream("GET", LOGIN_URL) as r:
+                r.raise_for_status()
+                token = (await scan_response_async(r, stop_on=("token",))).csrf_token
+            if token:
+                log(f"🔑 获取到 CSRF Token: {token[:8]}...")
+                return token
+            log("⚠️ 未找到 CSRF Token，可能页面结构已变。")
+            return None
+        except httpx.HTTPError as e:
+            log(f"❌ 获取登录页时出错: {e}")
+            return None
 
-    users = parse_users(user_credentials_secret)
-    if not users:
-        print("未解析到任何用户。退出。")
-        sys.exit(1)
+    async def try_saved_session(self, email, client):
+        """与同步版 try_saved_session 相同：Cookie 仍有效则直接返回成功结果，否则返回 None"""
+        try:
+            async with client.stream("GET", REDIRECT_URL) as response:
+                scan = await scan_response_async(response, stop_on=("days",))
+        except httpx.HTTPError as e:
+            log(f"⚠️ 使用已保存的 Cookie 访问客户区失败: {e}")
+            return None
+
+        if REDIRECT_URL not in str(response.url) or not (scan.found("logout") or scan.found("days")):
+            log("🔄 已保存的 Cookie 已失效，改用账号密码登录。")
+            return None
+
+        log(f"✅ 已通过保存的 Cookie 登录用户 {email}，正在解析剩余时间...")
+        cookie_store.save(email, client.cookies.jar)
+        remaining_days = extract_remaining_days(scan)
+        log(f"📆 剩余时间: {remaining_days} 天")
+        return {"email": email, "success": True, "days": remaining_days}
+
+    async def attempt_login(self, email, password):
+        """尝试登录并返回结果与剩余时间"""
+        async with self.semaphore:
+            client = self.new_client()
+            try:
+                with account_log():
+                    return await self._attempt_login(email, password, client)
+            finally:
+                await client.aclose()
+
+    async def _attempt_login(self, email, password, client):
+        log(f"\n👤 尝试登录用户：{email}")
+
+        if cookie_store and cookie_store.load(email, client.cookies.jar):
+            result = await self.try_saved_session(email, client)
+            if result:
+                return result
+            client.cookies.clear()
+            cookie_store.discard(email)
+
+        token = await self.get_csrf_token(client)
+        if not token:
+            log("⚠️ 获取 CSRF Token 失败，跳过此账号。")
+            return {"email": email, "success": False, "reason": "无法获取 CSRF Token"}
+
+        payload = {
+            EMAIL_FIELD: email,
+            PASSWORD_FIELD: password,
+            "token": token,
+            "rememberme": "on",
+        }
+        headers = {"Referer": LOGIN_URL, "Origin": BASE_URL}
+
+        try:
+            async with client.stream("POST", LOGIN_URL, data=payload, headers=headers) as response:
+                scan = await scan_response_async(response, stop_on=("days", "incorrect", "invalid_csrf"))
+        except httpx.HTTPError as e:
+            log(f"❌ 登录用户 {email} 时发生错误: {e}")
+            return {"email": email, "success": False, "reason": str(e)}
+
+        if REDIRECT_URL in str(response.url) or scan.found("clientarea"):
+            log(f"✅ 成功登录用户 {email}，正在解析剩余时间...")
+            if cookie_store:
+                cookie_store.save(email, client.cookies.jar)
+            remaining_days = extract_remaining_days(scan)
+            log(f"📆 剩余时间: {remaining_days} 天")
+            return {"email": email, "success": True, "days": remaining_days}
+        elif scan.found("incorrect"):
+            log(f"❌ 登录失败：账号或密码错误。用户 {email}")
+            return {"email": email, "success": False, "reason": "账号或密码错误"}
+        elif scan.found("invalid_csrf"):
+            log(f"❌ 登录失败：Token 无效。用户 {email}")
+            return {"email": email, "success": False, "reason": "CSRF Token 无效"}
+        else:
+            log(f"⚠️ 登录失败：未知原因。URL: {response.url}")
+            return {"email": email, "success": False, "reason": "未知错误"}
+
+    async def send_tg_message(self, message):
+        """通过 Telegram 发送通知"""
+        if not TG_BOT_TOKEN or not TG_CHAT_ID:
+            print("⚠️ 未设置 TG_BOT_TOKEN 或 TG_CHAT_ID，跳过 Telegram 通知。")
+            return
+
+        url = f"https://api.telegram.org/bot{TG_BOT_TOKEN}/sendMessage"
+        data = {"chat_id": TG_CHAT_ID, "text": message, "parse_mode": "Markdown"}
+        client = self.new_client()
+        try:
+            r = await client.post(url, data=data, timeout=10)
+            if r.status_code == 200:
+                print("📨 Telegram 通知已发送。")
+            else:
+                print(f"⚠️ Telegram 通知发送失败: {r.status_code} {r.text}")
+        except Exception as e:
+            print(f"⚠️ Telegram 通知错误: {e}")
+        finally:
+            await client.aclose()
+
+    async def run(self, users):
+        """并发登录全部账号，按原始顺序返回结果；在途任务数限制为并发数的两倍"""
+        results = []
+        window = deque()
+        for user in users:
+            window.append(asyncio.create_task(self.attempt_login(user.email, user.password)))
+            if len(window) >= self.concurrency * 2:
+                results.append(await window.popleft())
+        while window:
+            results.append(await window.popleft())
+        return results
+
+    async def aclose(self):
+        await self.transport.close_shared()
+
+
+async def main_async(users):
+    """异步引擎入口：登录与通知共用一个事件循环"""
+    engine = AsyncLoginEngine(WHM_CONCURRENCY, WHM_RATE_LIMIT)
+    try:
+        results = await engine.run(users)
+        if results:
+            await engine.send_tg_message(publish_report(results))
+        return results
+    finally:
+        await engine.aclose()
 
-    results = []
-    for user in users:
-        result = attempt_login(user['email'], user['password'])
-        results.append(result)
 
+def publish_report(results):
+    """生成并打印登录报告，返回报告文本"""
     # 统计结果
     total = len(results)
     success = sum(1 for r in results if r["success"])
@@ -176,12 +722,37 @@ def main():
 
     message = "\n".join(report_lines)
     print("\n" + message)
+    return message
+
+
+def main():
+    if not WHM_ACCOUNT_FILE and not os.getenv('WHM_ACCOUNT'):
+        print("错误：未设置 WHM_ACCOUNT 环境变量。请在 GitHub Secrets 中配置。")
+        sys.exit(1)
+    if WHM_ACCOUNT_FILE and WHM_ACCOUNT_FILE != "-" and not os.path.isfile(WHM_ACCOUNT_FILE):
+        print(f"错误：WHM_ACCOUNT_FILE 指定的账号文件不存在：{WHM_ACCOUNT_FILE}")
+        sys.exit(1)
 
-    # 发送 Telegram 通知
-    send_tg_message(message)
+    engine = "async" if "--async" in sys.argv[1:] else WHM_ENGINE
+    if engine == "async" and httpx is None:
+        print("⚠️ 未安装 httpx，无法使用异步引擎，改用同步引擎。")
+        engine = "sync"
+
+    if engine == "async":
+        print(f"⚙️ 使用异步引擎（HTTP/2: {'开启' if HTTP2_AVAILABLE else '未安装 h2，使用 HTTP/1.1'}）")
+        results = asyncio.run(main_async(open_user_source()))
+    else:
+        results = list(run_logins(open_user_source(), WHM_CONCURRENCY))
+        if results:
+            # 发送 Telegram 通知
+            send_tg_message(publish_report(results))
+
+    if not results:
+        print("未解析到任何用户。退出。")
+        sys.exit(1)
 
     # 所有失败则报错退出
-    if success == 0:
+    if not any(r["success"] for r in results):
         print("❌ 所有账号登录失败，脚本退出。")
         sys.exit(1)
 
@@ -0,0 +1,175 @@
+"""
+webhostmost 页面解析
+
+所有正则在导入时预编译，直接在响应的原始字节流上分块扫描：
+找到所需信息后即停止解析，不必多次解码整个 response.text。
+"""
+import re
+import time
+from datetime import date, datetime
+
+CHUNK_SIZE = 16 * 1024     # 每次读取的字节数
+OVERLAP = 512              # 相邻分块之间保留的重叠字节，防止匹配跨块被截断
+SCAN_LIMIT = 512 * 1024    # 最多扫描的字节数，超出部分不再解析
+DRAIN_LIMIT = 1024 * 1024  # 提前结束后最多丢弃读取的字节数，读完可让连接回到连接池复用
+
+# 页面标记，单个交替正则一次扫描全部识别
+MARKER_RE = re.compile(
+    rb"(?P<clientarea>clientarea\.php)"
+    rb"|(?P<logout>logout)"
+    rb"|(?P<incorrect>incorrect)"
+    rb"|(?P<invalid_csrf>invalid csrf token)",
+    re.IGNORECASE,
+)
+
+# 登录页 CSRF Token
+CSRF_RE = re.compile(rb'name="token"\s+value="([^"]+)"')
+
+# 剩余时间 / 到期时间：只匹配明确的剩余天数与到期标签，
+# 不匹配 WHMCS 账单的 "Next Due Date"，也不匹配 "suspended after 45 days of inactivity" 这类政策说明
+_GAP = rb"(?:[\s:]|&nbsp;|<[^<>]{0,80}>){0,12}"  # 标签与取值之间允许的空白、冒号与少量 HTML 标签
+REMAINING_RE = re.compile(
+    # 例: "44 days left" / "12 days remaining" / "3 more days until suspension"
+    rb"(?P<days_left>\d{1,4})\s*(?:more\s+)?days?\s+(?:left|remaining|(?:until|before)\s+suspen\w*)"
+    # 例: "Your account will be suspended in 44 days" / "Expires in: 30 days"
+    rb"|(?:expires?|suspended)\s+in\b" + _GAP + rb"(?P<days_in>\d{1,4})\s*days?"
+    # 例: "Expiry Date: 2025-12-01" / "<td>Suspension Date</td><td>2025-12-01</td>"
+    rb"|(?:expiry|expiration|suspension)\s+date" + _GAP + rb"(?P<date>\d{4}-\d{2}-\d{2})"
+    # 例: JS 倒计时 "expireTime = 1735689600000"
+    rb"|(?:countdown\w*|deadline|expire(?:s?At|_?time|_at)|suspend(?:At|_?time|_at))[\"']?\s*[=:]\s*[\"']?(?P<epoch>\d{10,13})\b",
+    re.IGNORECASE,
+)
+
+
+class PageScan:
+    """一次扫描得到的页面信息"""
+    __slots__ = ("markers", "csrf_token", "remaining_days", "scanned_bytes")
+
+    def __init__(self):
+        self.markers = set()
+        self.csrf_token = None
+        self.remaining_days = None
+        self.scanned_bytes = 0
+
+    def found(self, key):
+        if key == "token":
+            return self.csrf_token is not None
+        if key == "days":
+            return self.remaining_days is not None
+        return key in self.markers
+
+
+def _days_from_match(match, now):
+    if match.group("days_left"):
+        return int(match.group("days_left"))
+    if match.group("days_in"):
+        return int(match.group("days_in"))
+    if match.group("date"):
+        try:
+            expiry = datetime.strptime(match.group("date").decode("ascii"), "%Y-%m-%d")
+        except ValueError:
+            return None
+        days = (expiry.date() - date.fromtimestamp(now)).days  # 按日历日比较，到期当天为 0
+        return days if days >= 0 else None  # 已过去的日期不是有效的到期时间，继续查找或回退到估算
+    epoch = int(match.group("epoch"))
+    if epoch > 10 ** 11:  # 毫秒时间戳
+        epoch //= 1000
+    if epoch <= now:
+        return None
+    return int((epoch - now) // 86400)
+
+
+def scan_buffer(buffer, scan, final=True, now=None):
+    """
+    扫描一段字节。final=False 时忽略紧贴末尾的匹配，留给下一块带着重叠部分再判断，
+    避免把被截断的数字（如毫秒时间戳）当成完整结果。
+    """
+    now = now if now is not None else time.time()
+    end = len(buffer)
+
+    for match in MARKER_RE.finditer(buffer):
+        scan.markers.add(match.lastgroup)
+
+    if scan.csrf_token is None:
+        match = CSRF_RE.search(buffer)
+        if match and (final or match.end() < end):
+            scan.csrf_token = match.group(1).decode("ascii", "replace")
+
+    if scan.remaining_days is None:
+        for match in REMAINING_RE.finditer(buffer):
+            if not final and match.end() >= end:
+                break
+            days = _days_from_match(match, now)
+            if days is not None:
+                scan.remaining_days = days
+                break
+    return scan
+
+
+class ChunkScanner:
+    """
+    增量扫描器：逐块 feed() 字节，返回 True 表示已找到 stop_on 中任一项或达到扫描上限，可停止解析。
+    同步（requests）与异步（httpx）读取共用此逻辑。
+    """
+
+    def __init__(self, stop_on=()):
+        self.stop_on = stop_on
+        self.scan = PageScan()
+        self.tail = b""
+
+    def feed(self, chunk):
+        if not chunk:
+            return False
+        self.scan.scanned_bytes += len(chunk)
+        buffer = self.tail + chunk
+        scan_buffer(buffer, self.scan, final=False)
+        self.tail = buffer[-OVERLAP:]
+        return any(self.scan.found(key) for key in self.stop_on) or self.scan.scanned_bytes >= SCAN_LIMIT
+
+    def finish(self):
+        """正文已读完，对剩余的重叠部分做一次完整判断"""
+        if self.tail:
+            scan_buffer(self.tail, self.scan, final=True)
+            self.tail = b""
+        return self.scan
+
+
+def scan_response(response, stop_on=()):
+    """
+    分块读取 requests 的流式响应（stream=True）并扫描，stop_on 中任一项找到后即停止解析。
+    stop_on 可取 "token"、"days" 以及 MARKER_RE 中的标记名。
+    """
+    scanner = ChunkScanner(stop_on)
+    chunks = response.iter_content(chunk_size=CHUNK_SIZE)
+    for chunk in chunks:
+        if scanner.feed(chunk):
+            break
+    else:
+        return scanner.finish()
+
+    # 提前结束：丢弃剩余正文（不解析），让连接可以回到连接池
+    drained = 0
+    for chunk in chunks:
+        drained += len(chunk)
+        if drained >= DRAIN_LIMIT:
+            response.close()
+            break
+    return scanner.scan
+
+
+async def scan_response_async(response, stop_on=()):
+    """scan_response 的异步版本，用于 httpx 的流式响应（client.stream(...)）"""
+    scanner = ChunkScanner(stop_on)
+    chunks = response.aiter_bytes(chunk_size=CHUNK_SIZE)
+    async for chunk in chunks:
+        if scanner.feed(chunk):
+            break
+    else:
+        return scanner.finish()
+
+    drained = 0
+    async for chunk in chunks:
+        drained += len(chunk)
+        if drained >= DRAIN_LIMIT:
+            break
+    return scanner.scan